@@ -0,0 +1,218 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+import torch
+
+import main as main_rules
+from palace_dqn import DQNAgent
+from palace_env import CardGameEnv, STATE_SIZE
+from rules import DECK
+from vec_env import VecCardGameEnv
+
+ACTION_SIZE = 3
+
+
+def rate(count, seconds, unit="ops/s"):
+    return {"value": count / seconds, "unit": unit, "higher_is_better": True}
+
+
+def latency(samples, percentile):
+    return {"value": float(np.percentile(samples, percentile) * 1e6), "unit": "us", "higher_is_better": False}
+
+
+def run_for(duration, body):
+    """Calls body() until duration seconds have passed and returns (calls, seconds)"""
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + duration
+    while True:
+        body()
+        calls += 1
+        if calls % 64 == 0 and time.perf_counter() >= deadline:
+            return calls, time.perf_counter() - start
+
+
+def bench_env(duration):
+    env = CardGameEnv({}, [], [], seed=0)
+    env.reset()
+    rng = random.Random(0)
+    steps = 0
+    step_time = 0.0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        for _ in range(256):
+            _, _, done = env.step(rng.randrange(3))
+            if done:
+                env.reset()
+        step_time += time.perf_counter() - start
+        steps += 256
+
+    results = {"env_step": rate(steps, step_time, "steps/s")}
+    results["env_reset"] = rate(*run_for(duration, env.reset), "resets/s")
+    results["env_get_state"] = rate(*run_for(duration, env.get_state), "calls/s")
+
+    def episode():
+        env.reset()
+        for _ in range(1000):
+            if env.step(rng.randrange(3))[2]:
+                break
+
+    results["env_episode"] = rate(*run_for(duration, episode), "episodes/s")
+    return results
+
+
+def bench_vec_env(duration, scales):
+    results = {}
+    for num_envs in scales:
+        env = VecCardGameEnv(num_envs, seed=0)
+        env.reset()
+        rng = np.random.default_rng(0)
+        actions = rng.integers(0, ACTION_SIZE, size=(16, num_envs))
+        step = iter(range(sys.maxsize))
+        calls, seconds = run_for(duration, lambda: env.step(actions[next(step) % 16]))
+        results[f"vec_env_step_n{num_envs}"] = rate(calls * num_envs, seconds, "steps/s")
+    return results
+
+
+def bench_agent(duration, batch_sizes):
+    torch.manual_seed(0)
+    agent = DQNAgent(STATE_SIZE, ACTION_SIZE, epsilon=0.0)
+    env = CardGameEnv({}, [], [], seed=0)
+    states = []
+    state = env.reset()
+    for _ in range(4096):
+        states.append(state)
+        state, _, done = env.step(random.randrange(ACTION_SIZE))
+        if done:
+            state = env.reset()
+    states = np.array(states)
+
+    results = {}
+    samples = []
+    deadline = time.perf_counter() + duration
+    i = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        agent.act(states[i % len(states)])
+        samples.append(time.perf_counter() - start)
+        i += 1
+    for percentile in (50, 90, 99):
+        results[f"act_latency_p{percentile}"] = latency(samples, percentile)
+
+    for batch_size in batch_sizes:
+        batch = torch.tensor(states[:batch_size], dtype=torch.float32)
+        samples = []
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            with torch.no_grad():
+                agent.model(batch).argmax(dim=1)
+            samples.append(time.perf_counter() - start)
+        for percentile in (50, 99):
+            results[f"act_batch{batch_size}_latency_p{percentile}"] = latency(samples, percentile)
+        results[f"act_batch{batch_size}_throughput"] = rate(batch_size * len(samples), sum(samples), "states/s")
+
+    for i in range(len(states) - 1):
+        agent.remember(states[i], random.randrange(ACTION_SIZE), 1.0, states[i + 1], False)
+    results["replay_update"] = rate(*run_for(duration, lambda: agent.replay(32)), "updates/s")
+    return results
+
+
+def bench_main_rules(duration):
+    deck = [{"suit": suit, "rank": rank} for suit, rank in DECK]
+    pile = [{"suit": "Hearts", "rank": "9", "type": main_rules.CARD_TYPE_PILE}]
+    cards = [dict(card, type=main_rules.CARD_TYPE_IN_HAND) for card in deck[:9]]
+    ranks = [card["rank"] for card in deck]
+    rank_index = iter(range(sys.maxsize))
+
+    results = {
+        "main_is_valid_play": rate(*run_for(
+            duration, lambda: main_rules.is_valid_play(ranks[next(rank_index) % len(ranks)], pile)), "calls/s"),
+        "main_get_playable_cards": rate(*run_for(
+            duration, lambda: main_rules.get_playable_cards(cards)), "calls/s"),
+    }
+
+    rng_state = random.getstate()
+    random.seed(0)
+
+    def game():
+        distributed_cards, game_deck = main_rules.distribute(2, 9, [dict(card) for card in deck])
+        main_rules.initialize_player_cards(distributed_cards)
+        game_pile = []
+        player = 1
+        for _ in range(500):
+            if main_rules.play_turn(f"Player {player}", distributed_cards, game_deck, game_pile, is_computer=True):
+                break
+            player = 3 - player
+
+    results["main_computer_game"] = rate(*run_for(duration, game), "games/s")
+    random.setstate(rng_state)
+    return results
+
+
+def run_benchmarks(duration=1.0, vec_scales=(1, 64, 1024), batch_sizes=(32, 256)):
+    torch.set_num_threads(1)
+    results = {}
+    results.update(bench_env(duration))
+    results.update(bench_vec_env(duration, vec_scales))
+    results.update(bench_agent(duration, batch_sizes))
+    results.update(bench_main_rules(duration))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Returns the names of metrics that regressed by more than threshold (a fraction)"""
+    regressions = []
+    for name, metric in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]["value"]
+        new = metric["value"]
+        if metric["higher_is_better"]:
+            regressed = new < old * (1 - threshold)
+        else:
+            regressed = new > old * (1 + threshold)
+        change = (new - old) / old if old else 0.0
+        marker = "REGRESSION" if regressed else ""
+        print(f"{name:36s} {old:14.1f} -> {new:14.1f} {metric['unit']:10s} {change:+8.1%} {marker}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput and latency benchmarks for the Palace engines")
+    parser.add_argument("--duration", type=float, default=1.0, help="seconds per benchmark")
+    parser.add_argument("--vec-scales", type=int, nargs="+", default=[1, 64, 1024],
+                        help="VecCardGameEnv sizes to measure")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[32, 256],
+                        help="batch sizes for batched inference")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown against the baseline before failing (fraction)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.duration, args.vec_scales, args.batch_sizes)
+    for name, metric in results.items():
+        print(f"{name:36s} {metric['value']:14.1f} {metric['unit']}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"python": platform.python_version(), "torch": torch.__version__,
+                       "results": results}, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)["results"]
+        print(f"\n=== Comparison against {args.baseline} ===")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
@@ -0,0 +1,257 @@
+import argparse
+import json
+import math
+import multiprocessing as mp
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from mcts import MCTSAgent, load_model
+from numpy_policy import NumpyPolicy
+from palace_env import CardGameEnv, STATE_SIZE
+from rules import CARD_TYPE_FACE_DOWN
+
+ACTION_SIZE = 3
+
+
+class RandomPolicy:
+    """Picks any playable card, valid or not"""
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def __call__(self, env, state):
+        playable_cards, _ = env.get_playable_cards()
+        return self.rng.randrange(len(playable_cards)) if playable_cards else 0
+
+
+class ComputerPolicy:
+    """main.py's computer player: a random valid card, or a blind face-down card"""
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def __call__(self, env, state):
+        playable_cards, card_type = env.get_playable_cards()
+        if not playable_cards:
+            return 0
+        if card_type != CARD_TYPE_FACE_DOWN:
+            valid = [i for i, card in enumerate(playable_cards) if env.is_valid_play(card)]
+            if valid:
+                return self.rng.choice(valid)
+        return self.rng.randrange(len(playable_cards))
+
+
+class DQNPolicy:
+    """Greedy moves from a saved DQNAgent checkpoint"""
+
+    def __init__(self, model_path, epsilon=0.0, q_cache_size=100_000):
+        # Imported here so games between torch-free policies never load torch
+        from palace_dqn import DQNAgent
+        # Weights never change during evaluation, so repeated observations are cache hits
+        self.agent = DQNAgent(STATE_SIZE, ACTION_SIZE, memory_size=1, q_cache_size=q_cache_size)
+        self.agent.load_model(model_path)
+        self.agent.epsilon = epsilon
+
+    def __call__(self, env, state):
+        # The mover's position as the network was trained to see it, in whichever seat it plays
+        return self.agent.act(env.model_view(env.current_player, self.agent.canonical_observation, self.agent.seat))
+
+
+def make_policy(spec, seed=None):
+    """Builds a policy from 'random', 'computer', 'dqn:<checkpoint>', 'numpy:<export>' or 'mcts[:<model>]'"""
+    kind, _, arg = spec.partition(":")
+    if kind == "random":
+        return RandomPolicy(seed)
+    if kind == "computer":
+        return ComputerPolicy(seed)
+    if kind == "dqn":
+        return DQNPolicy(arg or "agent1_model.pth")
+    if kind == "numpy":
+        return NumpyPolicy(arg or "agent1_model.npz")
+    if kind == "mcts":
+        # Worker seeds are strings; derive the integer seed NumPy needs from them
+        return MCTSAgent(seed=random.Random(seed).getrandbits(64), **(load_model(arg) if arg else {}))
+    raise ValueError(f"Unknown player spec: {spec}")
+
+
+def play_game(env, policies, seed, max_moves=1000):
+    """Plays one game and returns (winner, moves); winner is 0 if max_moves ran out"""
+    state = env.reset(seed=seed)
+    for move in range(max_moves):
+        player = env.current_player
+        action = policies[player - 1](env, state)
+        state, _, done = env.step(action)
+        if done:
+            return player, move + 1
+    return 0, max_moves
+
+
+_policy_cache = {}
+
+
+def play_games(player_specs, first_seed, num_games, max_moves=1000):
+    """Worker entry point: plays seeds first_seed..first_seed+num_games-1"""
+    policies = []
+    for i, spec in enumerate(player_specs):
+        if spec.startswith(("dqn", "numpy")):
+            # Checkpoints are loaded once per worker process
+            if spec not in _policy_cache:
+                _policy_cache[spec] = make_policy(spec)
+            policies.append(_policy_cache[spec])
+        else:
+            policies.append(make_policy(spec, seed=f"{first_seed}-{i}"))
+
+    env = CardGameEnv({}, [], [])
+    wins = [0, 0]
+    draws = 0
+    moves = 0
+    for seed in range(first_seed, first_seed + num_games):
+        winner, game_moves = play_game(env, policies, seed, max_moves)
+        if winner:
+            wins[winner - 1] += 1
+        else:
+            draws += 1
+        moves += game_moves
+    return wins, draws, moves
+
+
+def wilson_interval(wins, n, z=1.96):
+    if n == 0:
+        return 0.0, 1.0
+    p = wins / n
+    denominator = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+class SPRT:
+    """Wald's sequential probability ratio test of win rate p0 (H0) against p1 (H1)"""
+
+    def __init__(self, p0, p1, alpha=0.05, beta=0.05):
+        self.p0 = p0
+        self.p1 = p1
+        self.upper = math.log((1 - beta) / alpha)
+        self.lower = math.log(beta / (1 - alpha))
+
+    def llr(self, wins, losses):
+        return (wins * math.log(self.p1 / self.p0) +
+                losses * math.log((1 - self.p1) / (1 - self.p0)))
+
+    def decision(self, wins, losses):
+        llr = self.llr(wins, losses)
+        if llr >= self.upper:
+            return "H1"
+        if llr <= self.lower:
+            return "H0"
+        return None
+
+
+def evaluate(player1="dqn:agent1_model.pth", player2="random", games=1000, workers=None,
+             batch_games=250, seed=0, max_moves=1000, sprt=None):
+    """Plays player1 (seat 1) against player2 (seat 2) and reports player1's win rate.
+
+    Games are split into batches of consecutive seeds run across a process
+    pool. With an SPRT the run stops at the first batch boundary where the
+    test is decided; draws (games hitting max_moves) count for neither side.
+    """
+    if workers is None:
+        workers = mp.cpu_count()
+    specs = (player1, player2)
+    batches = [(seed + start, min(batch_games, games - start)) for start in range(0, games, batch_games)]
+
+    wins = [0, 0]
+    draws = 0
+    moves = 0
+    decision = None
+    start_time = time.perf_counter()
+
+    def record(result):
+        nonlocal draws, moves, decision
+        batch_wins, batch_draws, batch_moves = result
+        wins[0] += batch_wins[0]
+        wins[1] += batch_wins[1]
+        draws += batch_draws
+        moves += batch_moves
+        if sprt is not None:
+            decision = sprt.decision(wins[0], wins[1])
+
+    if workers <= 1:
+        for first_seed, count in batches:
+            record(play_games(specs, first_seed, count, max_moves))
+            if decision:
+                break
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+            pending = set()
+            queued = iter(batches)
+            while True:
+                # Keep two batches per worker in flight so an early stop wastes little
+                while len(pending) < 2 * workers and not decision:
+                    batch = next(queued, None)
+                    if batch is None:
+                        break
+                    pending.add(pool.submit(play_games, specs, batch[0], batch[1], max_moves))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record(future.result())
+                if decision:
+                    for future in pending:
+                        future.cancel()
+                    break
+
+    played = wins[0] + wins[1] + draws
+    decided = wins[0] + wins[1]
+    low, high = wilson_interval(wins[0], decided)
+    return {
+        "player1": player1,
+        "player2": player2,
+        "games": played,
+        "player1_wins": wins[0],
+        "player2_wins": wins[1],
+        "draws": draws,
+        "player1_win_rate": wins[0] / decided if decided else 0.0,
+        "confidence_interval_95": [low, high],
+        "average_moves": moves / played if played else 0.0,
+        "sprt_decision": decision,
+        "seconds": time.perf_counter() - start_time,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate two Palace players against each other")
+    parser.add_argument("--player1", default="dqn:agent1_model.pth",
+                        help="'random', 'computer', 'dqn:<checkpoint>', 'numpy:<export>' or 'mcts[:<model>]'")
+    parser.add_argument("--player2", default="random")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--batch-games", type=int, default=250)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-moves", type=int, default=1000, help="moves before a game counts as a draw")
+    parser.add_argument("--sprt", type=float, nargs=2, metavar=("P0", "P1"),
+                        help="stop once player1's win rate is shown to be P0 or P1")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    sprt = SPRT(args.sprt[0], args.sprt[1], args.alpha, args.beta) if args.sprt else None
+    result = evaluate(args.player1, args.player2, games=args.games, workers=args.workers,
+                      batch_games=args.batch_games, seed=args.seed, max_moves=args.max_moves, sprt=sprt)
+
+    if args.json:
+        print(json.dumps(result))
+    else:
+        low, high = result["confidence_interval_95"]
+        print(f"\n=== Evaluation Results ===")
+        print(f"{result['player1']} vs {result['player2']}: {result['games']} games "
+              f"in {result['seconds']:.1f}s")
+        print(f"Player 1 wins: {result['player1_wins']}, Player 2 wins: {result['player2_wins']}, "
+              f"draws: {result['draws']}")
+        print(f"Player 1 win rate: {result['player1_win_rate']:.4f} (95% CI {low:.4f}-{high:.4f})")
+        print(f"Average game length: {result['average_moves']:.1f} moves")
+        if sprt is not None:
+            print(f"SPRT decision: {result['sprt_decision'] or 'undecided'}")
@@ -0,0 +1,85 @@
+import json
+import sys
+
+# Event levels. Call sites guard with `if events.level >= MOVE:` so a silent
+# game pays one attribute compare per event and never builds the message.
+OFF = 0
+GAME = 1
+MOVE = 2
+
+# Human-readable commentary as printed by palace_dqn.py
+COMMENTARY = {
+    "cannot_play": "{player} cannot play and picks up the pile.",
+    "invalid_play": "{player} played an invalid card and picks up the pile.",
+    "play": "{player} plays {rank} on top of the pile.\nTop of the pile is now: {rank}",
+    "burn": "Pile burned!",
+    "two": "2 played! Pile reset.",
+    "seven": "Seven played! Next card must be 7 or lower.",
+    "joker": "Joker played! Acts as a wild card.",
+    "play_again": "{player} gets another turn.",
+}
+
+
+class CommentarySink:
+    """Renders events as text. Templates are format strings or callables taking the fields."""
+
+    def __init__(self, templates=None, stream=None):
+        self.templates = COMMENTARY if templates is None else templates
+        self.stream = stream
+
+    def __call__(self, event, fields):
+        template = self.templates.get(event)
+        if template is None:
+            return
+        text = template(fields) if callable(template) else template.format(**fields)
+        print(text, file=self.stream if self.stream is not None else sys.stdout)
+
+
+class JsonLinesSink:
+    """Writes one JSON object per event"""
+
+    def __init__(self, path):
+        self.file = open(path, "a")
+
+    def __call__(self, event, fields):
+        self.file.write(json.dumps({"event": event, **fields}) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class GameEvents:
+    def __init__(self, level=OFF):
+        self.level = level
+        self.sinks = []
+
+    def configure(self, level, *sinks):
+        self.close()
+        self.level = level if sinks else OFF
+        self.sinks = list(sinks)
+
+    def emit(self, event, **fields):
+        for sink in self.sinks:
+            sink(event, fields)
+
+    def close(self):
+        for sink in self.sinks:
+            if hasattr(sink, "close"):
+                sink.close()
+        self.sinks = []
+        self.level = OFF
+
+
+events = GameEvents()
+
+
+def enable_commentary(level=MOVE, templates=None, stream=None):
+    events.configure(level, CommentarySink(templates, stream))
+
+
+def enable_json_log(path, level=MOVE):
+    events.configure(level, JsonLinesSink(path))
+
+
+def disable():
+    events.close()
@@ -0,0 +1,259 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+
+import numpy as np
+import torch
+
+from palace_dqn import DQNAgent, QValueCache
+from palace_env import CardGameEnv, STATE_SIZE
+
+ACTION_SIZE = 3
+
+
+class MicroBatcher:
+    """Coalesces concurrent observations into one forward pass.
+
+    A batch is run as soon as max_batch_size requests are waiting or
+    max_delay seconds after its first request arrived, whichever comes first.
+    """
+
+    def __init__(self, model, max_batch_size=256, max_delay=0.002):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.batched_requests = 0
+
+    async def predict(self, observation):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((observation, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                states = torch.from_numpy(np.array([observation for observation, _ in batch], dtype=np.float32))
+                with torch.no_grad():
+                    q_values = self.model(states).numpy()
+            except Exception as error:
+                # Fail this batch's requests rather than the loop, which every other client waits on
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            self.batches += 1
+            self.batched_requests += len(batch)
+            for (_, future), q in zip(batch, q_values):
+                if not future.done():
+                    future.set_result(q)
+
+
+class InferenceServer:
+    """Minimal HTTP/1.1 server answering POST /act and GET /metrics with JSON.
+
+    /act takes {"state": [91 ints]} or {"game": {"distributed_cards": ...,
+    "pile": [...], "current_player": 1, "seven_rule_active": false}} and
+    returns the greedy action and Q-values; for a game it also returns the
+    index and card within the current player's playable cards.
+    """
+
+    def __init__(self, model_path, max_batch_size=256, max_delay=0.002, cache_size=100_000):
+        torch.set_num_threads(1)
+        agent = DQNAgent(STATE_SIZE, ACTION_SIZE, memory_size=1)
+        agent.load_model(model_path)
+        self.batcher = MicroBatcher(agent.model, max_batch_size, max_delay)
+        self.canonical_observation = agent.canonical_observation
+        self.seat = agent.seat
+        # The served weights are frozen, so repeated observations skip the batcher entirely
+        self.cache = QValueCache(cache_size) if cache_size else None
+        self.requests = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=10000)
+        self.start_time = time.perf_counter()
+
+    async def handle_act(self, body):
+        request = json.loads(body)
+        if not isinstance(request, dict):
+            raise ValueError("the request must be a JSON object")
+        env = None
+        if "game" in request:
+            game = request["game"]
+            if not isinstance(game, dict) or not isinstance(game.get("distributed_cards"), dict):
+                raise ValueError("game must be an object with a distributed_cards object")
+            if game.get("current_player", 1) not in (1, 2):
+                raise ValueError("current_player must be 1 or 2")
+            env = CardGameEnv(game["distributed_cards"], [], game.get("pile", []))
+            env.current_player = game.get("current_player", 1)
+            env.seven_rule_active = game.get("seven_rule_active", False)
+            observation = env.model_view(env.current_player, self.canonical_observation, self.seat)
+        else:
+            observation = np.asarray(request["state"], dtype=np.float32)
+            if observation.shape != (STATE_SIZE,):
+                raise ValueError(f"state must have {STATE_SIZE} values")
+
+        key = np.asarray(observation, dtype=np.float32).tobytes()
+        q_values = self.cache.get(key) if self.cache is not None else None
+        if q_values is None:
+            q_values = await self.batcher.predict(observation)
+            if self.cache is not None:
+                self.cache.put(key, q_values)
+        action = int(np.argmax(q_values))
+        response = {"action": action, "q_values": q_values.tolist()}
+        if env is not None:
+            playable_cards, card_type = env.get_playable_cards()
+            if playable_cards:
+                index = action % len(playable_cards)
+                suit, rank = env.cards[playable_cards[index]]
+                response.update(card_index=index, card={"suit": suit, "rank": rank, "type": card_type})
+        return response
+
+    def metrics(self):
+        latencies = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        elapsed = time.perf_counter() - self.start_time
+        batches = self.batcher.batches
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "requests_per_second": self.requests / elapsed,
+            "batches": batches,
+            "mean_batch_size": self.batcher.batched_requests / batches if batches else 0.0,
+            "latency_ms_p50": float(np.percentile(latencies, 50)),
+            "latency_ms_p99": float(np.percentile(latencies, 99)),
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                start = time.perf_counter()
+                status = "200 OK"
+                try:
+                    if method == "POST" and path == "/act":
+                        response = await self.handle_act(body)
+                        self.requests += 1
+                        self.latencies.append(time.perf_counter() - start)
+                    elif method == "GET" and path == "/metrics":
+                        response = self.metrics()
+                    else:
+                        status, response = "404 Not Found", {"error": f"no route for {method} {path}"}
+                except (ValueError, KeyError, TypeError, IndexError, AttributeError) as error:
+                    self.errors += 1
+                    status, response = "400 Bad Request", {"error": f"{type(error).__name__}: {error}"}
+                except Exception as error:
+                    self.errors += 1
+                    status, response = "500 Internal Server Error", {"error": f"{type(error).__name__}: {error}"}
+
+                payload = json.dumps(response).encode()
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8080):
+        batcher = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+
+async def load_test(host="127.0.0.1", port=8080, concurrency=64, requests=10000, seed=0):
+    """Keep-alive clients posting random observations; returns client-side stats"""
+    rng = np.random.default_rng(seed)
+    latencies = []
+
+    async def client(count):
+        reader, writer = await asyncio.open_connection(host, port)
+        for _ in range(count):
+            body = json.dumps({"state": rng.integers(0, 4, STATE_SIZE).tolist()}).encode()
+            start = time.perf_counter()
+            writer.write(f"POST /act HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                if line.lower().startswith(b"content-length"):
+                    length = int(line.split(b":")[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+        writer.close()
+
+    start = time.perf_counter()
+    # The first requests % concurrency clients send one extra request so exactly `requests` are sent
+    await asyncio.gather(*(client(requests // concurrency + (i < requests % concurrency)) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / elapsed,
+        "latency_ms_p50": float(np.percentile(latencies, 50)),
+        "latency_ms_p99": float(np.percentile(latencies, 99)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-batching DQN inference server for Palace")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="serve a saved model")
+    serve_parser.add_argument("--model", default="agent1_model.pth")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8080)
+    serve_parser.add_argument("--max-batch-size", type=int, default=256)
+    serve_parser.add_argument("--max-delay-ms", type=float, default=2.0,
+                              help="longest a request waits for its batch to fill")
+    serve_parser.add_argument("--cache-size", type=int, default=100_000,
+                              help="observations whose Q-values are kept in an LRU cache (0 disables it)")
+    load_parser = subparsers.add_parser("load-test", help="drive a running server with local clients")
+    load_parser.add_argument("--host", default="127.0.0.1")
+    load_parser.add_argument("--port", type=int, default=8080)
+    load_parser.add_argument("--concurrency", type=int, default=64)
+    load_parser.add_argument("--requests", type=int, default=10000)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = InferenceServer(args.model, args.max_batch_size, args.max_delay_ms / 1000, args.cache_size)
+        try:
+            asyncio.run(server.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(json.dumps(asyncio.run(load_test(args.host, args.port, args.concurrency, args.requests))))
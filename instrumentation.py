@@ -0,0 +1,175 @@
+import cProfile
+import json
+import time
+from collections import defaultdict
+
+
+class TrainingStats:
+    """Per-phase timers and game counters for a training loop.
+
+    Nothing is measured until instrument() wraps the env and agent methods on
+    those instances, so an uninstrumented loop runs exactly the original code.
+    Timings nest: get_state is also counted inside step.
+
+    Metrics are written every export_interval seconds, either appended as JSON
+    lines or rewritten as a Prometheus text-format file. profile_window =
+    (first_step, num_steps) runs cProfile or the torch profiler over that many
+    env steps and dumps the result to profile_path.
+    """
+
+    def __init__(self, export_path=None, export_format="jsonl", export_interval=10.0,
+                 profile_window=None, profiler="cprofile", profile_path="training_profile"):
+        self.export_path = export_path
+        self.export_format = export_format
+        self.export_interval = export_interval
+        self.profile_window = profile_window
+        self.profiler = profiler
+        self.profile_path = profile_path
+
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.gauges = {}
+        self.agents = []
+        self.episode_steps = 0
+        self.start_time = self.last_export = time.perf_counter()
+        self._active_profiler = None
+
+    def instrument(self, env, *agents):
+        self.agents.extend(agents)
+        self._wrap(env, "get_state")
+        self._wrap_step(env)
+        for agent in agents:
+            self._wrap(agent, "act")
+            self._wrap(agent, "remember")
+            self._wrap_replay(agent)
+        return self
+
+    def _wrap(self, obj, name):
+        method = getattr(obj, name)
+        seconds = self.seconds
+        calls = self.calls
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = method(*args, **kwargs)
+            seconds[name] += time.perf_counter() - start
+            calls[name] += 1
+            return result
+
+        setattr(obj, name, timed)
+
+    def _wrap_step(self, env):
+        step = env.step
+
+        def timed_step(action):
+            # Steps are counted from 0, so the window starts before step first_step runs
+            if self.profile_window is not None and self.calls["step"] == self.profile_window[0]:
+                self._start_profiler()
+            start = time.perf_counter()
+            state, reward, done = step(action)
+            end = time.perf_counter()
+            self.seconds["step"] += end - start
+            self.calls["step"] += 1
+            self._count_move(env, reward, done)
+            if self._active_profiler is not None and self.calls["step"] >= sum(self.profile_window):
+                self._stop_profiler()
+            if self.export_path is not None and end - self.last_export >= self.export_interval:
+                self.export()
+            return state, reward, done
+
+        env.step = timed_step
+
+    def _wrap_replay(self, agent):
+        replay = agent.replay
+
+        def timed_replay(batch_size):
+            start = time.perf_counter()
+            loss = replay(batch_size)
+            self.seconds["replay"] += time.perf_counter() - start
+            self.calls["replay"] += 1
+            if loss is not None:
+                self.gauges["loss"] = loss
+            return loss
+
+        agent.replay = timed_replay
+
+    def _count_move(self, env, reward, done):
+        counters = self.counters
+        self.episode_steps += 1
+        if reward == -5:
+            counters["invalid_plays"] += 1
+            counters["pickups"] += 1
+        elif reward == -10:
+            counters["pickups"] += 1
+        elif not env.pile:
+            # A valid play only leaves the pile empty when it was a 10
+            counters["burns"] += 1
+        if done:
+            counters["episodes"] += 1
+            counters["episode_steps"] += self.episode_steps
+            self.gauges["last_episode_length"] = self.episode_steps
+            self.episode_steps = 0
+
+    def _start_profiler(self):
+        if self.profiler == "torch":
+            import torch.profiler
+            self._active_profiler = torch.profiler.profile(record_shapes=True)
+            self._active_profiler.__enter__()
+        else:
+            self._active_profiler = cProfile.Profile()
+            self._active_profiler.enable()
+
+    def _stop_profiler(self):
+        if self.profiler == "torch":
+            self._active_profiler.__exit__(None, None, None)
+            self._active_profiler.export_chrome_trace(f"{self.profile_path}.json")
+        else:
+            self._active_profiler.disable()
+            self._active_profiler.dump_stats(f"{self.profile_path}.prof")
+        self._active_profiler = None
+        self.profile_window = None
+
+    def snapshot(self):
+        for i, agent in enumerate(self.agents):
+            suffix = f"_agent{i + 1}" if len(self.agents) > 1 else ""
+            self.gauges[f"epsilon{suffix}"] = agent.epsilon
+            self.gauges[f"replay_fill{suffix}"] = len(agent.memory) / agent.memory.capacity
+            if getattr(agent, "q_cache", None) is not None:
+                self.gauges[f"q_cache_hit_rate{suffix}"] = agent.q_cache.hit_rate
+        episodes = self.counters["episodes"]
+        if episodes:
+            self.gauges["mean_episode_length"] = self.counters["episode_steps"] / episodes
+        return {
+            "elapsed_seconds": time.perf_counter() - self.start_time,
+            "phase_seconds": dict(self.seconds),
+            "phase_calls": dict(self.calls),
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+        }
+
+    def export(self):
+        self.last_export = time.perf_counter()
+        snapshot = self.snapshot()
+        if self.export_format == "prometheus":
+            with open(self.export_path, "w") as file:
+                file.write(format_prometheus(snapshot))
+        else:
+            with open(self.export_path, "a") as file:
+                file.write(json.dumps(snapshot) + "\n")
+
+
+def format_prometheus(snapshot):
+    lines = ["# TYPE palace_phase_seconds_total counter"]
+    for phase, seconds in snapshot["phase_seconds"].items():
+        lines.append(f'palace_phase_seconds_total{{phase="{phase}"}} {seconds}')
+    lines.append("# TYPE palace_phase_calls_total counter")
+    for phase, calls in snapshot["phase_calls"].items():
+        lines.append(f'palace_phase_calls_total{{phase="{phase}"}} {calls}')
+    for name, value in snapshot["counters"].items():
+        lines.append(f"# TYPE palace_{name}_total counter")
+        lines.append(f"palace_{name}_total {value}")
+    for name, value in snapshot["gauges"].items():
+        lines.append(f"# TYPE palace_{name} gauge")
+        lines.append(f"palace_{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -1,61 +1,17 @@
 import json
 import random
 
-# Constants for card types
-CARD_TYPE_IN_HAND = "In Hand"
-CARD_TYPE_FACE_UP = "Face Up"
-CARD_TYPE_FACE_DOWN = "Face Down"
-CARD_TYPE_PILE = "Pile"
-
-# Constants for card ranks
-RANK_ORDER = {
-    '2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8,
-    '9': 9, '10': 10, 'Jack': 11, 'Queen': 12, 'King': 13, 'Ace': 14
-}
-
-def get_playable_cards(player_cards):
-    """Returns the current playable cards based on priority (hand -> face up -> face down)"""
-    in_hand = [card for card in player_cards if card['type'] == CARD_TYPE_IN_HAND]
-    if in_hand:
-        return in_hand, CARD_TYPE_IN_HAND
-    
-    face_up = [card for card in player_cards if card['type'] == CARD_TYPE_FACE_UP]
-    if face_up:
-        return face_up, CARD_TYPE_FACE_UP
-    
-    face_down = [card for card in player_cards if card['type'] == CARD_TYPE_FACE_DOWN]
-    return face_down, CARD_TYPE_FACE_DOWN
-
-def is_valid_play(card_rank, pile, seven_rule_active=False):
-    """Validates if a card can be played on the current pile"""
-    if not pile:
-        return True
-    
-    top_card = pile[-1]
-    if seven_rule_active and RANK_ORDER[card_rank] > 7:
-        return False
-    
-    return (RANK_ORDER[card_rank] >= RANK_ORDER[top_card['rank']] or 
-            card_rank in ['10', '7', '2'])
-
-def handle_special_card(rank, pile):
-    """Handles special card effects (10, 2, 7) and returns if another turn is allowed"""
-    if rank == '10':
-        pile.clear()
-        print("Pile flushed!")
-        return True
-    elif rank == '2':
-        print("2 played! You can play another card.")
-        return True
-    elif rank == '7':
-        print("Seven played! Next player must play 7 or lower.")
-    return False
+from game_events import events, enable_commentary, MOVE
+from rules import (CARD_TYPE_IN_HAND, CARD_TYPE_FACE_UP, CARD_TYPE_FACE_DOWN, CARD_TYPE_PILE, RANK_ORDER,
+                   get_playable_cards, is_valid_play, seven_rule_active, handle_special_card, pick_up_pile,
+                   format_distributed_cards)
 
 def play_card(player, card, distributed_cards, pile):
     """Plays a card and adds it to the pile"""
     distributed_cards[player].remove(card)
     pile.append({"suit": card['suit'], "rank": card['rank'], "type": CARD_TYPE_PILE})
-    print(f"{player} played: {card['suit']} {card['rank']}")
+    if events.level >= MOVE:
+        events.emit("play", player=player, suit=card['suit'], rank=card['rank'], card_type=card['type'])
     return handle_special_card(card['rank'], pile)
 
 def play_face_down_card(player, distributed_cards, pile):
@@ -64,10 +20,12 @@ def play_face_down_card(player, distributed_cards, pile):
     
     while face_down_cards:
         card = random.choice(face_down_cards)
-        print(f"{player} played face-down card: {card['suit']} {card['rank']}")
+        if events.level >= MOVE:
+            events.emit("face_down_play", player=player, suit=card['suit'], rank=card['rank'])
         
-        if not is_valid_play(card['rank'], pile):
-            print(f"Face-down card cannot be played. Must pick up the pile.")
+        if not is_valid_play(card['rank'], pile, seven_rule_active(pile)):
+            if events.level >= MOVE:
+                events.emit("face_down_invalid", player=player, pile_size=len(pile))
             distributed_cards[player].remove(card)
             card['type'] = CARD_TYPE_IN_HAND
             pile.append(card)
@@ -81,9 +39,16 @@ def play_face_down_card(player, distributed_cards, pile):
             
         return len(distributed_cards[player]) == 0
     
-    return False
+    # A 2 or 10 as the last face-down card leaves the player with no cards: they have won
+    return len(distributed_cards[player]) == 0
 
-def handle_human_turn(player, distributed_cards, pile, playable_cards):
+def computer_policy(player, distributed_cards, pile, playable_cards):
+    """The default computer player: a random valid card, or None to pick up the pile"""
+    seven_rule = seven_rule_active(pile)
+    valid_playable_cards = [card for card in playable_cards if is_valid_play(card['rank'], pile, seven_rule)]
+    return random.choice(valid_playable_cards) if valid_playable_cards else None
+
+def handle_human_turn(player, distributed_cards, deck, pile, playable_cards):
     """Handles human player's turn"""
     consecutive_plays = 0
     while True:
@@ -126,11 +91,11 @@ def handle_human_turn(player, distributed_cards, pile, playable_cards):
                 continue
                 
             card = chosen_cards[0]
-            seven_rule_active = pile and pile[-1]['rank'] == '7'
+            seven_rule = seven_rule_active(pile)
             
-            if not is_valid_play(card['rank'], pile, seven_rule_active):
+            if not is_valid_play(card['rank'], pile, seven_rule):
                 print("Invalid play. Card must be higher or special (2, 7, 10).")
-                if seven_rule_active:
+                if seven_rule:
                     print("Seven rule is active - must play 7 or lower!")
                 continue
             
@@ -147,39 +112,44 @@ def handle_human_turn(player, distributed_cards, pile, playable_cards):
             
         print("Invalid action. Please try again.")
 
-def play_turn(player, distributed_cards, deck, pile, is_computer=False):
-    """Main turn function that handles both human and computer turns"""
-    print(f"\n{player}'s turn:")
-    
+def play_turn(player, distributed_cards, deck, pile, is_computer=False, policy=computer_policy):
+    """Main turn function that handles both human and computer turns.
+
+    Computer turns play the card `policy(player, distributed_cards, pile, playable_cards)`
+    returns, which must be a valid play, or pick up the pile when it returns None.
+    """
     playable_cards, card_type = get_playable_cards(distributed_cards[player])
     
-    if pile:
-        print(f"Top card: {pile[-1]['suit']} {pile[-1]['rank']} (Pile size: {len(pile)})")
-    else:
-        print("Pile is empty")
+    if events.level >= MOVE:
+        events.emit("turn", player=player)
+        if pile:
+            events.emit("pile_top", suit=pile[-1]['suit'], rank=pile[-1]['rank'], pile_size=len(pile))
+        else:
+            events.emit("pile_empty")
     game_over = False
     # Handle face down cards
     if card_type == CARD_TYPE_FACE_DOWN:
         game_over = play_face_down_card(player, distributed_cards, pile)
     else:
         if is_computer:
-            # Computer logic: randomly play a valid card
-            valid_playable_cards = [card for card in playable_cards if is_valid_play(card['rank'], pile)]
-            if valid_playable_cards:
-                card = random.choice(valid_playable_cards)
+            card = policy(player, distributed_cards, pile, playable_cards)
+            if card is not None:
                 play_card(player, card, distributed_cards, pile)
+                game_over = len(distributed_cards[player]) == 0
             else:
-                print(f"{player} cannot play any cards and must pick up the pile.")
+                if events.level >= MOVE:
+                    events.emit("cannot_play", player=player, pile_size=len(pile))
                 pile, distributed_cards[player] = pick_up_pile(pile, distributed_cards[player])
                 return False
         else:
-            game_over = handle_human_turn(player, distributed_cards, pile, playable_cards)
+            game_over = handle_human_turn(player, distributed_cards, deck, pile, playable_cards)
     
     # Draw cards if needed
     if deck and not game_over:
         deck, distributed_cards[player] = pick_up_from_deck(deck, distributed_cards[player])
     
-    pprint(distributed_cards)
+    if events.level >= MOVE:
+        events.emit("table", distributed_cards=distributed_cards)
     return game_over
 
 # Utility functions (unchanged)
@@ -206,12 +176,6 @@ def pick_up_from_deck(deck, cards_in_hand):
 
     return deck, cards_in_hand
 
-def pick_up_pile(pile, cards_in_hand):
-    for card in pile:
-        card["type"] = CARD_TYPE_IN_HAND
-    cards_in_hand.extend(pile)
-    return [], cards_in_hand
-
 def initialize_player_cards(distributed_cards):
     for cards in distributed_cards.values():
         for i, card in enumerate(cards):
@@ -223,14 +187,26 @@ def initialize_player_cards(distributed_cards):
                 card["type"] = CARD_TYPE_FACE_DOWN
 
 def pprint(distributed_cards):
-    for player, cards in distributed_cards.items():
-        print(f"\n{player}\n" + "-" * 10)
-        for card in cards:
-            if card['type'] != CARD_TYPE_FACE_DOWN:
-                print(f"{card['suit']} {card['rank']} {card['type']}")
-        print("*" * 15)
+    print(format_distributed_cards(distributed_cards))
+
+# Game commentary for the interactive game, rendered from game_events
+COMMENTARY = {
+    "turn": "\n{player}'s turn:",
+    "pile_top": "Top card: {suit} {rank} (Pile size: {pile_size})",
+    "pile_empty": "Pile is empty",
+    "play": "{player} played: {suit} {rank}",
+    "face_down_play": "{player} played face-down card: {suit} {rank}",
+    "face_down_invalid": "Face-down card cannot be played. Must pick up the pile.",
+    "cannot_play": "{player} cannot play any cards and must pick up the pile.",
+    "burn": "Pile flushed!",
+    "two": "2 played! You can play another card.",
+    "seven": "Seven played! Next player must play 7 or lower.",
+    "table": lambda fields: format_distributed_cards(fields['distributed_cards']),
+}
 
 if __name__ == "__main__":
+    enable_commentary(templates=COMMENTARY)
+
     # Load deck
     try:
         with open("cards.json", "r") as file:
@@ -0,0 +1,273 @@
+import argparse
+import math
+import random
+import time
+
+import numpy as np
+
+from game_events import events, OFF
+from palace_env import CardGameEnv, ZONE_IN_HAND, ZONE_FACE_UP, ZONE_FACE_DOWN, STATE_SIZE
+from rules import CARD_TYPE_FACE_DOWN
+
+
+def information_key(env, player):
+    """Hash of what `player` can see with env.current_player to move; suits are ignored"""
+    # The key, like the +1/-1 backups, assumes a single opponent
+    if env.num_players != 2:
+        raise ValueError("MCTSAgent only searches two-player games")
+    own = env.zones[player - 1]
+    other = env.zones[2 - player]
+    ranks = env.card_ranks
+    return hash((
+        env.current_player, env.seven_rule_active,
+        tuple([ranks[card] for card in own[ZONE_IN_HAND]]),
+        tuple([ranks[card] for card in own[ZONE_FACE_UP]]),
+        len(own[ZONE_FACE_DOWN]),
+        len(other[ZONE_IN_HAND]),
+        tuple(sorted([ranks[card] for card in env.public_cards[2 - player]])),
+        tuple([ranks[card] for card in other[ZONE_FACE_UP]]),
+        len(other[ZONE_FACE_DOWN]),
+        tuple([ranks[card] for card in env.pile]),
+    ))
+
+
+def num_actions(env):
+    """One action per playable card; step() accepts any index below their count"""
+    return max(1, len(env.get_playable_cards()[0]))
+
+
+class Node:
+    __slots__ = ("visits", "action_visits", "action_values", "prior")
+
+    def __init__(self, prior):
+        self.visits = 0
+        self.action_visits = [0] * len(prior)
+        self.action_values = [0.0] * len(prior)
+        self.prior = prior
+
+
+class MCTSAgent:
+    """Determinized Monte Carlo tree search over CardGameEnv.
+
+    Every iteration redeals the cards the mover cannot see (their own
+    face-down cards, the opponent's hand and face-down cards, the deck) and
+    descends with PUCT. Nodes live in a transposition table keyed by what the
+    searching player can see (information_key), opponent turns included, so
+    statistics are shared between determinizations and kept across moves
+    until the table reaches max_table_size.
+
+    Unlike the DQN, which only reaches the first max_action_size cards, the
+    search considers every playable card. Leaves are scored by a random
+    rollout, or with `model` (DQNAgent.model or a NumpyPolicy) by a softmax
+    prior over its Q-values (cards beyond its outputs get the lowest one) and a
+    value of tanh(max Q / value_scale). The model sees each node from its
+    mover's side, through the view it was trained on (canonical_observation,
+    or model_seat for absolute-view networks; load_model supplies both), and
+    its evaluations are cached per view. Either prior is scaled by invalid_prior for cards that would
+    be an invalid play, since those only pick up the pile. Values are +1 for a
+    win and -1 for a loss. With a `tablebase` (tablebase.Tablebase) leaves small
+    enough to be in it take its exact value instead.
+    """
+
+    def __init__(self, time_budget=0.05, iterations=None, c_puct=1.5, model=None, value_scale=10.0,
+                 prior_temperature=1.0, invalid_prior=0.05, rollout_limit=300, max_depth=100,
+                 max_table_size=1_000_000, tablebase=None, canonical_observation=False, model_seat=None, seed=None):
+        self.time_budget = time_budget
+        self.iterations = iterations
+        self.c_puct = c_puct
+        self.model = model
+        # The view the model was trained on, so every node is evaluated from its mover's side
+        self.canonical_observation = canonical_observation
+        self.model_seat = model_seat
+        self.value_scale = value_scale
+        self.prior_temperature = prior_temperature
+        self.invalid_prior = invalid_prior
+        self.rollout_limit = rollout_limit
+        self.max_depth = max_depth
+        self.max_table_size = max_table_size
+        self.tablebase = tablebase
+        self.rng = np.random.default_rng(seed)
+        self.rollout_rng = random.Random(seed)
+        self.table = {}
+        self.evaluation_cache = {}
+        self.scratch = CardGameEnv({}, [], [], seed=0)
+        self.last_iterations = 0
+
+    def act(self, env):
+        if env.num_players != 2:
+            raise ValueError("MCTSAgent only searches two-player games")
+        if num_actions(env) == 1:
+            return 0
+        if len(self.table) > self.max_table_size:
+            self.table.clear()
+            self.evaluation_cache.clear()
+
+        root = env.snapshot()
+        player = env.current_player
+        scratch = self.scratch
+        deadline = time.perf_counter() + self.time_budget
+        level = events.level
+        events.level = OFF
+        iterations = 0
+        try:
+            while True:
+                scratch.restore(root)
+                scratch.determinize(player, self.rng)
+                self.simulate(scratch, player)
+                iterations += 1
+                if self.iterations is not None:
+                    if iterations >= self.iterations:
+                        break
+                elif time.perf_counter() >= deadline:
+                    break
+        finally:
+            events.level = level
+        self.last_iterations = iterations
+
+        node = self.table[information_key(env, player)]
+        return max(range(len(node.action_visits)), key=lambda action: (node.action_visits[action], node.prior[action]))
+
+    def __call__(self, env, state):
+        return self.act(env)
+
+    def simulate(self, env, player):
+        path = []
+        while True:
+            key = information_key(env, player)
+            node = self.table.get(key)
+            # Positions can repeat, so a descent through known nodes may cycle; max_depth ends it
+            if node is None or len(path) >= self.max_depth:
+                prior, value = self.evaluate(env)
+                if node is None:
+                    self.table[key] = Node(prior)
+                # value is for the player to move; backups are from player 1's side
+                value = value if env.current_player == 1 else -value
+                break
+
+            action = self.select(node)
+            mover = env.current_player
+            path.append((node, action, mover))
+            _, _, done = env.step(action)
+            if done:
+                value = 1.0 if mover == 1 else -1.0
+                break
+
+        for node, action, mover in path:
+            node.visits += 1
+            node.action_visits[action] += 1
+            node.action_values[action] += value if mover == 1 else -value
+
+    def select(self, node):
+        scale = self.c_puct * math.sqrt(node.visits + 1)
+        # Unvisited actions start from the node's mean value
+        default_value = sum(node.action_values) / node.visits if node.visits else 0.0
+        best_action = 0
+        best_score = -math.inf
+        for action, (visits, total, prior) in enumerate(zip(node.action_visits, node.action_values, node.prior)):
+            score = (total / visits if visits else default_value) + scale * prior / (1 + visits)
+            if score > best_score:
+                best_action = action
+                best_score = score
+        return best_action
+
+    def evaluate(self, env):
+        """(prior over distinct actions, value for the player to move)"""
+        count = num_actions(env)
+        weights = self.rule_weights(env, count)
+        entry = self.tablebase.probe(env) if self.tablebase is not None else None
+        if self.model is None or entry is not None:
+            total = sum(weights)
+            return [weight / total for weight in weights], entry[0] if entry is not None else self.rollout(env)
+
+        view = env.model_view(env.current_player, self.canonical_observation, self.model_seat)
+        key = view.tobytes()
+        cached = self.evaluation_cache.get(key)
+        if cached is None:
+            cached = self.q_values(view)
+            self.evaluation_cache[key] = cached
+        q_values = cached[:count]
+        if count > len(q_values):
+            q_values = np.concatenate([q_values, np.full(count - len(q_values), cached.min())])
+        logits = q_values / self.prior_temperature
+        prior = np.exp(logits - logits.max()) * weights
+        value = math.tanh(float(q_values.max()) / self.value_scale)
+        return (prior / prior.sum()).tolist(), value
+
+    def rule_weights(self, env, count):
+        playable_cards, card_type = env.get_playable_cards()
+        if not playable_cards or card_type == CARD_TYPE_FACE_DOWN:
+            return [1.0] * count
+        return [1.0 if env.is_valid_play(card) else self.invalid_prior for card in playable_cards]
+
+    def q_values(self, observation):
+        if hasattr(self.model, "q_values"):
+            return self.model.q_values(observation)
+        import torch
+        with torch.no_grad():
+            return self.model(torch.from_numpy(observation.astype(np.float32))).numpy()
+
+    def rollout(self, env):
+        """Random legal play to the end; returns the result for the player to move now"""
+        player = env.current_player
+        randrange = self.rollout_rng.randrange
+        for _ in range(self.rollout_limit):
+            playable_cards, card_type = env.get_playable_cards()
+            count = len(playable_cards)
+            action = 0
+            if count > 1:
+                if card_type != CARD_TYPE_FACE_DOWN:
+                    valid = [i for i in range(count) if env.is_valid_play(playable_cards[i])]
+                    action = valid[randrange(len(valid))] if valid else randrange(count)
+                else:
+                    action = randrange(count)
+            mover = env.current_player
+            _, _, done = env.step(action)
+            if done:
+                return 1.0 if mover == player else -1.0
+        return 0.0
+
+
+def load_model(path):
+    """MCTSAgent keyword arguments for a checkpoint or .npz export: the network and the view it was trained on"""
+    if path.endswith(".npz"):
+        from numpy_policy import NumpyPolicy
+        policy = NumpyPolicy(path)
+        if policy.state_size != STATE_SIZE:
+            raise ValueError(f"{path} was trained at a table with other than two players")
+        return {"model": policy, "canonical_observation": policy.canonical_observation,
+                "model_seat": policy.seat or None}
+    from palace_dqn import DQNAgent
+    agent = DQNAgent(STATE_SIZE, 3, memory_size=1)
+    agent.load_model(path)
+    return {"model": agent.model, "canonical_observation": agent.canonical_observation, "model_seat": agent.seat}
+
+
+if __name__ == "__main__":
+    from evaluate import make_policy, play_game
+
+    parser = argparse.ArgumentParser(description="Play the MCTS agent against another Palace player")
+    parser.add_argument("--opponent", default="random", help="'random', 'computer' or 'dqn:<checkpoint>'")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--time", type=float, default=0.05, help="seconds of search per move")
+    parser.add_argument("--model", help="checkpoint or .npz export used for priors and values")
+    parser.add_argument("--tablebase", help="endgame table written by tablebase.py")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tablebase = None
+    if args.tablebase:
+        from tablebase import Tablebase
+        tablebase = Tablebase(args.tablebase)
+    agent = MCTSAgent(time_budget=args.time, tablebase=tablebase, seed=args.seed,
+                      **(load_model(args.model) if args.model else {}))
+    opponent = make_policy(args.opponent, seed=args.seed)
+    env = CardGameEnv({}, [], [])
+    wins = 0
+    for game in range(args.games):
+        # Alternate seats so neither side keeps the first-move advantage
+        policies = (agent, opponent) if game % 2 == 0 else (opponent, agent)
+        winner, moves = play_game(env, policies, args.seed + game)
+        won = winner == (1 if game % 2 == 0 else 2)
+        wins += won
+        print(f"Game {game + 1}/{args.games}: {'MCTS' if won else 'opponent'} won in {moves} moves")
+    print(f"\nMCTS win rate: {wins / args.games:.3f} ({args.time * 1000:.0f} ms per move)")
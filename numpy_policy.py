@@ -0,0 +1,67 @@
+import argparse
+
+import numpy as np
+
+
+class NumpyPolicy:
+    """Greedy DQN moves evaluated with NumPy only.
+
+    Loads the .npz written by DQNAgent.export_numpy (w0, b0, w1, b1, ...) and
+    runs the same Linear/ReLU stack as build_model in float32, so importing it
+    does not pull in torch. The export's canonical_observation flag and seat
+    say which view the network was trained on.
+    """
+
+    def __init__(self, path):
+        with np.load(path) as arrays:
+            count = sum(1 for name in arrays.files if name.startswith("w"))
+            self.weights = [np.ascontiguousarray(arrays[f"w{i}"], dtype=np.float32) for i in range(count)]
+            self.biases = [np.ascontiguousarray(arrays[f"b{i}"], dtype=np.float32) for i in range(count)]
+            # Exports from before the flag existed were trained on the absolute layout
+            self.canonical_observation = bool(arrays["canonical_observation"]) \
+                if "canonical_observation" in arrays.files else False
+            # 0 when canonical or unknown; absolute-view networks then read positions as seat 1
+            self.seat = int(arrays["seat"]) if "seat" in arrays.files else 0
+        self.state_size = self.weights[0].shape[0]
+        self.action_size = self.weights[-1].shape[1]
+
+    def q_values(self, states):
+        """Q-values for one state (shape (state_size,)) or a batch (shape (n, state_size))"""
+        x = np.asarray(states, dtype=np.float32)
+        last = len(self.weights) - 1
+        for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            x = x @ weight
+            x += bias
+            if i < last:
+                np.maximum(x, 0, out=x)
+        return x
+
+    def act(self, state):
+        return int(np.argmax(self.q_values(state)))
+
+    def act_batch(self, states):
+        return np.argmax(self.q_values(states), axis=1)
+
+    def __call__(self, env, state):
+        if env.state_size != self.state_size:
+            raise ValueError(f"The network reads {self.state_size} observation values, but this table has "
+                             f"{env.state_size}; it was trained with a different number of players")
+        return self.act(env.model_view(env.current_player, self.canonical_observation, self.seat))
+
+
+def export_checkpoint(model_path, output_path):
+    """Converts a torch checkpoint into the NumpyPolicy format (needs torch)"""
+    import torch
+    from palace_dqn import DQNAgent, checkpoint_state_size
+    # The export keeps whatever table size the checkpoint was trained at
+    agent = DQNAgent(checkpoint_state_size(torch.load(model_path)), 3, memory_size=1)
+    agent.load_model(model_path)
+    agent.export_numpy(output_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a DQN checkpoint for torch-free inference")
+    parser.add_argument("model", help="checkpoint written by DQNAgent.save_model")
+    parser.add_argument("output", help="destination .npz file")
+    args = parser.parse_args()
+    export_checkpoint(args.model, args.output)
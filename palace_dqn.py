@@ -2,245 +2,87 @@ import numpy as np
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from collections import deque
 import random
-import json
 import os
-
-CARD_TYPE_IN_HAND = "In Hand"
-CARD_TYPE_FACE_UP = "Face Up"
-CARD_TYPE_FACE_DOWN = "Face Down"
-CARD_TYPE_PILE = "Pile"
-
-RANK_ORDER = {
-    '2': 2,
-    '3': 3,
-    '4': 4,
-    '5': 5,
-    '6': 6,
-    '7': 7,
-    '8': 8,
-    '9': 9,
-    '10': 10,
-    'Jack': 11,
-    'Queen': 12,
-    'King': 13,
-    'Ace': 14,
-    'Joker': 15
-}
-
-def get_playable_cards(player_cards, seven_rule_active=False):
-    in_hand = [card for card in player_cards if card['type'] == CARD_TYPE_IN_HAND]
-    if in_hand:
-        return in_hand, CARD_TYPE_IN_HAND
-
-    face_up = [card for card in player_cards if card['type'] == CARD_TYPE_FACE_UP]
-    if face_up:
-        return face_up, CARD_TYPE_FACE_UP
-
-    face_down = [card for card in player_cards if card['type'] == CARD_TYPE_FACE_DOWN]
-    return face_down, CARD_TYPE_FACE_DOWN
-
-def is_valid_play(card_rank, pile, seven_rule_active=False, joker_allowed=True):
-    if not pile:
-        return True
-
-    top_card = pile[-1]
-    top_rank = top_card['rank']
-    
-    if card_rank == 'Joker' and joker_allowed:
-        return True
-
-    if seven_rule_active and RANK_ORDER[card_rank] > 7:
-        return False
-
-    return (RANK_ORDER[card_rank] >= RANK_ORDER[top_rank] or 
-            card_rank in ['2', '7', '10'])
-
-def handle_special_card(rank, pile):
-    if rank == '10':
-        pile.clear()
-        print("Pile burned!")
-        return True
-    elif rank == '2':
-        print("2 played! Pile reset.")
-        return True
-    elif rank == '7':
-        print("Seven played! Next card must be 7 or lower.")
-        return False
-    elif rank == 'Joker':
-        print("Joker played! Acts as a wild card.")
-        return False
-    return False
-
-def distribute(players, num_face_down, num_face_up, num_in_hand, deck):
-    if players * (num_face_down + num_face_up + num_in_hand) > len(deck):
-        raise ValueError("Not enough cards to distribute")
-
-    random.shuffle(deck)
-    distribution = {}
-    for i in range(players):
-        player_key = f"Player {i + 1}"
-        distribution[player_key] = deck[i * (num_face_down + num_face_up + num_in_hand):
-                                        (i + 1) * (num_face_down + num_face_up + num_in_hand)]
-        for idx, card in enumerate(distribution[player_key]):
-            if idx < num_face_down:
-                card["type"] = CARD_TYPE_FACE_DOWN
-            elif idx < num_face_down + num_face_up:
-                card["type"] = CARD_TYPE_FACE_UP
-            else:
-                card["type"] = CARD_TYPE_IN_HAND
-    remaining_deck = deck[players * (num_face_down + num_face_up + num_in_hand):]
-    return distribution, remaining_deck
-
-def pick_up_pile(pile, player_cards):
-    for card in pile:
-        card["type"] = CARD_TYPE_IN_HAND
-    player_cards.extend(pile)
-    return [], player_cards
+import re
+from collections import OrderedDict
+
+from game_events import enable_commentary, disable as disable_events
+from replay_buffer import ReplayBuffer, PrioritizedReplayBuffer
+from rules import (CARD_TYPE_IN_HAND, CARD_TYPE_FACE_UP, CARD_TYPE_FACE_DOWN, CARD_TYPE_PILE, RANK_ORDER,
+                   JOKER_RANK, SPECIAL_RANKS, NUM_RANKS, CARDS_PATH, load_deck, DECK, DECK_RANKS, VALID_PLAY,
+                   get_playable_cards, is_valid_play, handle_special_card, distribute, pick_up_pile,
+                   format_distributed_cards)
+from palace_env import (CardGameEnv, DECK_RANK_ARRAY, ZONE_TYPES, ZONE_IN_HAND, ZONE_FACE_UP, ZONE_FACE_DOWN,
+                        NUM_ZONES, PILE_TOP_INDEX, PLAYER_BLOCK, STATE_SIZE)
+
+def checkpoint_state_size(checkpoint):
+    """Observation size a loaded checkpoint was trained on; older ones only record it in the first layer"""
+    if 'state_size' in checkpoint:
+        return checkpoint['state_size']
+    return checkpoint.get('model_state_dict', checkpoint)['0.weight'].shape[1]
 
 def pprint_distributed_cards(distributed_cards):
-    for player, cards in distributed_cards.items():
-        print(f"\n{player}\n" + "-" * 10)
-        for card in cards:
-            if card['type'] != CARD_TYPE_FACE_DOWN:
-                print(f"{card['suit']} {card['rank']} {card['type']}")
-        print("*" * 15)
-
-class CardGameEnv:
-    def __init__(self, distributed_cards, deck, pile):
-        self.distributed_cards = distributed_cards
-        self.deck = deck
-        self.pile = pile
-        self.current_player = 1
-        self.game_over = False
-        self.seven_rule_active = False
-        self.max_hand_size = 3
-        self.max_action_size = 3  # Maximum number of cards that can be played at once
-
-    def get_state(self):
-        player1 = self.distributed_cards["Player 1"]
-        player2 = self.distributed_cards["Player 2"]
-
-        def encode_cards(cards):
-            # Create a list of 15 zeros (one for each possible rank 2-15)
-            rank_counts = [0] * 15  
-            
-            # Count occurrences of each rank
-            for card in cards:
-                rank = card['rank']
-                rank_value = RANK_ORDER.get(rank, 0) - 1  # Subtract 1 to use 0-based indexing
-                if rank_value >= 0:
-                    rank_counts[rank_value] += 1
-                    
-            return rank_counts
-
-        # Encode all cards by their type
-        player1_hand = encode_cards([card for card in player1 if card['type'] == CARD_TYPE_IN_HAND])
-        player1_face_up = encode_cards([card for card in player1 if card['type'] == CARD_TYPE_FACE_UP])
-        player1_face_down = encode_cards([card for card in player1 if card['type'] == CARD_TYPE_FACE_DOWN])
-        
-        player2_hand = encode_cards([card for card in player2 if card['type'] == CARD_TYPE_IN_HAND])
-        player2_face_up = encode_cards([card for card in player2 if card['type'] == CARD_TYPE_FACE_UP])
-        player2_face_down = encode_cards([card for card in player2 if card['type'] == CARD_TYPE_FACE_DOWN])
-
-        pile_top = RANK_ORDER[self.pile[-1]['rank']] if self.pile else 0
-
-        # Combine all state components
-        state = np.array(
-            player1_hand + player1_face_up + player1_face_down +
-            player2_hand + player2_face_up + player2_face_down + 
-            [pile_top]
-        )
-
-        return state
-
-    def step(self, action):
-        player_key = f"Player {self.current_player}"
-        player_cards = self.distributed_cards[player_key]
-        playable_cards, card_type = get_playable_cards(player_cards, self.seven_rule_active)
-
-        # Ensure action is within bounds of playable cards
-        action = action % len(playable_cards) if playable_cards else 0
-
-        if not playable_cards:
-            print(f"{player_key} cannot play and picks up the pile.")
-            self.pile, player_cards = pick_up_pile(self.pile, player_cards)
-            self.distributed_cards[player_key] = player_cards
-            self.switch_player()
-            return self.get_state(), -10, False
-
-        chosen_card = playable_cards[action]
-        valid = is_valid_play(
-            chosen_card['rank'], self.pile, self.seven_rule_active)
-
-        if not valid:
-            print(f"{player_key} played an invalid card and picks up the pile.")
-            self.pile, player_cards = pick_up_pile(self.pile, player_cards)
-            self.distributed_cards[player_key] = player_cards
-            self.switch_player()
-            return self.get_state(), -5, False
-
-        self.play_card(player_key, chosen_card)
-
-        if len(self.distributed_cards[player_key]) == 0:
-            reward = 10
-            self.game_over = True
-            return self.get_state(), reward, self.game_over
-        else:
-            reward = 1
-
-        return self.get_state(), reward, self.game_over
-
-    def play_card(self, player_key, card):
-        print(f"{player_key} plays {card['rank']} on top of the pile.")
-        self.distributed_cards[player_key].remove(card)
-        self.pile.append({"suit": card['suit'], "rank": card['rank'], "type": CARD_TYPE_PILE})
-
-        print(f"Top of the pile is now: {card['rank']}")
-
-        play_again = handle_special_card(card['rank'], self.pile)
-
-        if card['rank'] == '7':
-            self.seven_rule_active = True
-        elif card['rank'] in ['2', '10']:
-            self.seven_rule_active = False
-        elif card['rank'] == 'Joker':
-            self.seven_rule_active = False
-        else:
-            self.seven_rule_active = False
-
-        if play_again:
-            print(f"{player_key} gets another turn.")
-        else:
-            self.switch_player()
-
-    def switch_player(self):
-        self.current_player = 2 if self.current_player == 1 else 1
-
-    def reset(self):
-        try:
-            with open("cards.json", "r") as file:
-                deck = json.load(file)
-        except FileNotFoundError:
-            print("Error: 'cards.json' file not found.")
-            exit(1)
-
-        players = 2
-        num_face_down = 3
-        num_face_up = 3
-        num_in_hand = 3
-        self.distributed_cards, self.deck = distribute(players, num_face_down, num_face_up, num_in_hand, deck)
-        self.pile = []
-        self.current_player = random.choice([1, 2])
-        self.game_over = False
-        self.seven_rule_active = False
-
-        return self.get_state()
+    print(format_distributed_cards(distributed_cards))
+
+def mask_q_values(q_values, mask):
+    # Illegal actions can never be the max or argmax
+    if mask is None:
+        return q_values
+    return q_values.masked_fill(~mask, float('-inf'))
+
+class QValueCache:
+    """Bounded LRU map from observation bytes to Q-values, with hit statistics.
+
+    Statistics are cumulative; clear() only drops the entries.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        q_values = self.entries.get(key)
+        if q_values is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return q_values
+
+    def put(self, key, q_values):
+        # Shared between callers, so entries are read-only
+        q_values.flags.writeable = False
+        self.entries[key] = q_values
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        if self.entries:
+            self.entries.clear()
+            self.invalidations += 1
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate,
+                "size": len(self.entries), "invalidations": self.invalidations}
 
 class DQNAgent:
     def __init__(self, state_size, action_size, lr=0.001, gamma=0.99,
-                 epsilon=1.0, epsilon_decay=0.995, epsilon_min=0.01):
+                 epsilon=1.0, epsilon_decay=0.995, epsilon_min=0.01,
+                 memory_size=100000, memory_path=None, prioritized_replay=False,
+                 target_update_interval=0, tau=None, double_dqn=False, action_masks=False,
+                 q_cache_size=0, canonical_observation=False):
         self.state_size = state_size
         self.action_size = action_size
         self.gamma = gamma
@@ -248,9 +90,56 @@ class DQNAgent:
         self.epsilon_decay = epsilon_decay
         self.epsilon_min = epsilon_min
         self.lr = lr
-
-        self.memory = deque(maxlen=2000)
+        # Set when trained on CardGameEnv.canonical_state views; saved so players know which view to feed
+        self.canonical_observation = canonical_observation
+        # Seat an absolute-view network was trained in (None for canonical ones); see CardGameEnv.seat_view
+        self.seat = None if canonical_observation else 1
+
+        self.prioritized_replay = prioritized_replay
+        # action_masks stores each next state's legal actions so replay targets only max over those
+        self.action_masks = action_masks
+        mask_size = action_size if action_masks else None
+        if prioritized_replay:
+            self.memory = PrioritizedReplayBuffer(memory_size, state_size, path=memory_path, action_size=mask_size)
+        else:
+            self.memory = ReplayBuffer(memory_size, state_size, path=memory_path, action_size=mask_size)
         self.model = self.build_model()
+        # Kept for the agent's lifetime so Adam's moment estimates survive between replays
+        self.optimizer = optim.Adam(self.model.parameters(), lr=self.lr)
+        self.criterion = nn.MSELoss()
+
+        # target_update_interval syncs a target network every N replays, tau
+        # Polyak-averages it after every replay; with neither, targets come from
+        # the online network itself
+        self.target_update_interval = target_update_interval
+        self.tau = tau
+        self.double_dqn = double_dqn
+        self.replay_steps = 0
+        self.target_model = None
+        self.configure_target_model()
+
+        # Greedy Q-values per observation; cleared whenever replay() or load_model() changes the weights
+        self.q_cache = QValueCache(q_cache_size) if q_cache_size else None
+
+    def configure_target_model(self):
+        if self.double_dqn and not (self.target_update_interval or self.tau):
+            raise ValueError("double_dqn needs a target network: set target_update_interval or tau")
+        if not (self.target_update_interval or self.tau):
+            self.target_model = None
+        elif self.target_model is None:
+            self.target_model = self.build_model()
+            self.target_model.load_state_dict(self.model.state_dict())
+            self.target_model.eval()
+
+    def update_target_model(self):
+        if self.target_model is None:
+            return
+        if self.tau:
+            with torch.no_grad():
+                for target_param, param in zip(self.target_model.parameters(), self.model.parameters()):
+                    target_param.mul_(1 - self.tau).add_(param, alpha=self.tau)
+        elif self.replay_steps % self.target_update_interval == 0:
+            self.target_model.load_state_dict(self.model.state_dict())
 
     def build_model(self):
         model = nn.Sequential(
@@ -262,74 +151,206 @@ class DQNAgent:
         ).to('cpu')
         return model
 
-    def remember(self, state, action, reward, next_state, done):
-        self.memory.append((state, action, reward, next_state, done))
+    def remember(self, state, action, reward, next_state, done, next_mask=None):
+        self.memory.append(state, action, reward, next_state, done, next_mask)
 
-    def act(self, state):
+    def act(self, state, mask=None):
+        """Epsilon-greedy action; with a legal-action mask both branches pick legal actions only"""
         if np.random.rand() <= self.epsilon:
-            return random.randrange(self.action_size)
+            if mask is None:
+                return random.randrange(self.action_size)
+            return random.choice(np.flatnonzero(mask).tolist())
+        act_values = self.q_values(state)
+        if mask is not None:
+            act_values = np.where(mask, act_values, -np.inf)
+        return int(np.argmax(act_values))
+
+    def q_values(self, state):
+        """Q-values of one state as a NumPy array, looked up in q_cache when it is enabled"""
+        state = np.asarray(state, dtype=np.float32)
+        if self.q_cache is not None:
+            key = state.tobytes()
+            q_values = self.q_cache.get(key)
+            if q_values is not None:
+                return q_values
         with torch.no_grad():
-            state_tensor = torch.tensor(state, dtype=torch.float32).unsqueeze(0)
-            act_values = self.model(state_tensor)
-        return torch.argmax(act_values).item()
+            q_values = self.model(torch.from_numpy(state).unsqueeze(0))[0].numpy()
+        if self.q_cache is not None:
+            self.q_cache.put(key, q_values)
+        return q_values
+
+    def clear_q_cache(self):
+        """Drops cached Q-values; call after changing self.model's weights directly"""
+        if self.q_cache is not None:
+            self.q_cache.clear()
 
     def replay(self, batch_size):
         if len(self.memory) < batch_size:
             return
 
-        minibatch = random.sample(self.memory, batch_size)
-        optimizer = optim.Adam(self.model.parameters(), lr=self.lr)
-        criterion = nn.MSELoss()
+        index = self.memory.sample_indices(batch_size)
+        state_tensor, action_tensor, reward_tensor, next_state_tensor, done_tensor = \
+            self.memory.get_batch(index)
 
-        for state, action, reward, next_state, done in minibatch:
-            state_tensor = torch.tensor(state, dtype=torch.float32).unsqueeze(0)
-            next_state_tensor = torch.tensor(next_state, dtype=torch.float32).unsqueeze(0)
+        next_mask = self.memory.get_next_masks(index)
 
-            target_values = self.model(state_tensor)
-            target = target_values.clone().detach()
-
-            if done:
-                target[0][action] = reward
+        with torch.no_grad():
+            if self.target_model is None:
+                next_q = mask_q_values(self.model(next_state_tensor), next_mask).max(dim=1).values
+            elif self.double_dqn:
+                # Online network picks the next action, target network evaluates it
+                next_actions = mask_q_values(self.model(next_state_tensor), next_mask).argmax(dim=1, keepdim=True)
+                next_q = self.target_model(next_state_tensor).gather(1, next_actions).squeeze(1)
             else:
-                with torch.no_grad():
-                    target[0][action] = reward + self.gamma * torch.max(self.model(next_state_tensor))
-
-            outputs = self.model(state_tensor)
-            loss = criterion(outputs, target)
+                next_q = mask_q_values(self.target_model(next_state_tensor), next_mask).max(dim=1).values
+        target_q = reward_tensor + self.gamma * next_q * (1 - done_tensor)
+
+        outputs = self.model(state_tensor)
+        # Only the taken action's Q-value is pulled towards its target
+        target = outputs.detach().clone()
+        target[torch.arange(batch_size), action_tensor] = target_q
+
+        if self.prioritized_replay:
+            td_errors = target_q - outputs.detach()[torch.arange(batch_size), action_tensor]
+            weights = self.memory.importance_weights(index)
+            loss = (weights * (outputs - target).pow(2).mean(dim=1)).mean()
+            self.memory.update_priorities(index, td_errors.numpy())
+        else:
+            loss = self.criterion(outputs, target)
 
-            optimizer.zero_grad()
-            loss.backward()
-            optimizer.step()
+        self.optimizer.zero_grad()
+        loss.backward()
+        self.optimizer.step()
+        self.replay_steps += 1
+        self.update_target_model()
+        self.clear_q_cache()
 
         if self.epsilon > self.epsilon_min:
             self.epsilon *= self.epsilon_decay
 
+        return loss.item()
+
     def save_model(self, filename):
-        torch.save(self.model.state_dict(), filename)
+        checkpoint = {
+            'model_state_dict': self.model.state_dict(),
+            'optimizer_state_dict': self.optimizer.state_dict(),
+            'target_update_interval': self.target_update_interval,
+            'tau': self.tau,
+            'double_dqn': self.double_dqn,
+            'replay_steps': self.replay_steps,
+            'canonical_observation': self.canonical_observation,
+            'seat': self.seat,
+            'state_size': self.state_size,
+            'num_players': (self.state_size - 1) // PLAYER_BLOCK,
+        }
+        if self.target_model is not None:
+            checkpoint['target_model_state_dict'] = self.target_model.state_dict()
+        torch.save(checkpoint, filename)
+        # A memory-mapped replay buffer is saved alongside, so training can resume with it
+        self.memory.flush()
+
+    def export_numpy(self, filename):
+        # Linear weights are stored transposed so numpy_policy computes x @ W + b
+        linears = [layer for layer in self.model if isinstance(layer, nn.Linear)]
+        arrays = {}
+        for i, layer in enumerate(linears):
+            arrays[f'w{i}'] = layer.weight.detach().numpy().T.copy()
+            arrays[f'b{i}'] = layer.bias.detach().numpy().copy()
+        np.savez(filename, canonical_observation=np.bool_(self.canonical_observation), seat=np.int8(self.seat or 0),
+                 **arrays)
 
     def load_model(self, filename):
         if os.path.isfile(filename):
-            self.model.load_state_dict(torch.load(filename))
+            checkpoint = torch.load(filename)
+            state_size = checkpoint_state_size(checkpoint)
+            if state_size != self.state_size:
+                raise ValueError(f"{filename} was trained at a {(state_size - 1) // PLAYER_BLOCK}-player table "
+                                 f"({state_size} observation values), but this agent plays at a "
+                                 f"{(self.state_size - 1) // PLAYER_BLOCK}-player table ({self.state_size} values)")
+            # Older checkpoints hold the bare model state dict
+            if 'model_state_dict' in checkpoint:
+                self.model.load_state_dict(checkpoint['model_state_dict'])
+                if 'optimizer_state_dict' in checkpoint:
+                    self.optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
+                if 'target_update_interval' in checkpoint:
+                    self.target_update_interval = checkpoint['target_update_interval']
+                    self.tau = checkpoint['tau']
+                    self.double_dqn = checkpoint['double_dqn']
+                    self.replay_steps = checkpoint['replay_steps']
+                self.canonical_observation = checkpoint.get('canonical_observation', False)
+                self.seat = checkpoint.get('seat')
+            else:
+                self.model.load_state_dict(checkpoint)
+                self.canonical_observation = False
+                self.seat = None
+            if self.seat is None and not self.canonical_observation:
+                # Checkpoints from before the seat was saved follow the agent{seat}_model.pth naming
+                match = re.search(r"agent(\d+)_model", os.path.basename(filename))
+                self.seat = int(match.group(1)) if match else 1
+
+            self.configure_target_model()
+            if self.target_model is not None:
+                target_state = checkpoint.get('target_model_state_dict', self.model.state_dict())
+                self.target_model.load_state_dict(target_state)
             self.model.eval()
+            self.clear_q_cache()
         else:
             print("Model file not found.")
 
 if __name__ == "__main__":
-    distributed_cards = {"Player 1": [], "Player 2": []}
+    import argparse
+    from instrumentation import TrainingStats
+
+    parser = argparse.ArgumentParser(description="Train two DQN agents at Palace by self-play")
+    parser.add_argument("--stats", help="export per-phase timings and counters to this file")
+    parser.add_argument("--stats-format", choices=["jsonl", "prometheus"], default="jsonl")
+    parser.add_argument("--stats-interval", type=float, default=10.0, help="seconds between exports")
+    parser.add_argument("--profile", type=int, nargs=2, metavar=("FIRST_STEP", "NUM_STEPS"),
+                        help="profile a window of training steps")
+    parser.add_argument("--profiler", choices=["cprofile", "torch"], default="cprofile")
+    parser.add_argument("--legal-actions", action="store_true",
+                        help="mask illegal actions in act and replay; the env never plays them")
+    parser.add_argument("--shared", action="store_true",
+                        help="one network and replay buffer for every seat, on current-player-first observations")
+    parser.add_argument("--players", type=int, default=2, help="players at the table (2-8)")
+    parser.add_argument("--decks", type=int, default=1, help="copies of cards.json shuffled together")
+    parser.add_argument("--max-moves", type=int, default=1000,
+                        help="moves before an episode without a winner is cut off (legal-only play can cycle)")
+    args = parser.parse_args()
+
+    distributed_cards = {f"Player {player}": [] for player in range(1, args.players + 1)}
     deck = []
     pile = []
 
-    env = CardGameEnv(distributed_cards, deck, pile)
+    env = CardGameEnv(distributed_cards, deck, pile, legal_only=args.legal_actions, canonical=args.shared,
+                      num_players=args.players, num_decks=args.decks, max_moves=args.max_moves)
     state = env.reset()
-    state_size = 91  # (15 ranks * 6 card types) + 1 pile top card
+    state_size = env.state_size  # (15 ranks * 3 card types) per player + 1 pile top card
     action_size = 3  # Maximum number of cards that can be played at once
 
-    agent1 = DQNAgent(state_size, action_size)
-    agent2 = DQNAgent(state_size, action_size)
+    agent1 = DQNAgent(state_size, action_size, action_masks=args.legal_actions, canonical_observation=args.shared)
+    # Shared mode: every seat acts with and learns into the same agent, so every transition trains it
+    agents = [agent1] * args.players if args.shared else \
+        [agent1] + [DQNAgent(state_size, action_size, action_masks=args.legal_actions) for _ in range(args.players - 1)]
+
+    def legal_mask(player=None):
+        return env.legal_action_mask(player) if args.legal_actions else None
 
     # Load pre-trained model if available
     agent1.load_model("agent1_model.pth")
-    agent2.load_model("agent2_model.pth")
+    # Whatever view the checkpoint was trained on, it is saved with the one used from here on
+    agent1.canonical_observation = args.shared
+    agent1.seat = None if args.shared else 1
+    if not args.shared:
+        for player, agent in enumerate(agents[1:], start=2):
+            agent.load_model(f"agent{player}_model.pth")
+            agent.seat = player
+
+    stats = None
+    if args.stats or args.profile:
+        stats = TrainingStats(args.stats, args.stats_format, args.stats_interval,
+                              profile_window=args.profile, profiler=args.profiler)
+        stats.instrument(env, *dict.fromkeys(agents))
 
     episodes = 1000
     batch_size = 32
@@ -340,55 +361,52 @@ if __name__ == "__main__":
         done = False
 
         while not done:
-            current_agent = agent1 if env.current_player == 1 else agent2
-            action = current_agent.act(state)
-
-            player_key = f"Player {env.current_player}"
-            player_cards = env.distributed_cards[player_key]
-            playable_cards, _ = get_playable_cards(player_cards, env.seven_rule_active)
-
-            if action >= len(playable_cards):
-                next_state, reward, done = env.step(action)
-            else:
-                next_state, reward, done = env.step(action)
+            mover = env.current_player
+            current_agent = agents[mover - 1]
+            action = current_agent.act(state, legal_mask())
+            next_state, reward, done = env.step(action)
 
-            current_agent.remember(state, action, reward, next_state, done)
+            # next_state is the next mover's view; the transition keeps the outcome as this mover sees it
+            remembered = env.canonical_state(mover) if args.shared else next_state
+            # Replay maxes over the mover's own actions in the stored next state, so mask them, not the next mover's.
+            # A cut-off episode did not end the game, so its last transition still bootstraps from the next state.
+            current_agent.remember(state, action, reward, remembered, done and not env.truncated, legal_mask(mover))
             state = next_state
             total_reward += reward
 
             if done:
-                print(f"Episode {e+1}/{episodes} finished with total reward: {total_reward}")
+                outcome = f"was cut off after {env.moves} moves" if env.truncated else "finished"
+                print(f"Episode {e+1}/{episodes} {outcome} with total reward: {total_reward}")
                 break
 
-        agent1.replay(batch_size)
-        agent2.replay(batch_size)
+        for agent in dict.fromkeys(agents):
+            agent.replay(batch_size)
+
+    if stats is not None and stats.export_path:
+        stats.export()
     # exit()
     print("\n=== Testing: Agents Playing Against Each Other ===\n")
 
-    agent1.epsilon = agent1.epsilon_min
-    agent2.epsilon = agent2.epsilon_min
+    for agent in agents:
+        agent.epsilon = agent.epsilon_min
 
+    enable_commentary()
     state = env.reset()
     done = False
 
     while not done:
-        current_agent = agent1 if env.current_player == 1 else agent2
-        action = current_agent.act(state)
-
-        player_key = f"Player {env.current_player}"
-        player_cards = env.distributed_cards[player_key]
-        playable_cards, _ = get_playable_cards(player_cards, env.seven_rule_active)
-
-        if action >= len(playable_cards):
-            next_state, reward, done = env.step(action)
-        else:
-            next_state, reward, done = env.step(action)
+        mover = env.current_player
+        current_agent = agents[mover - 1]
+        action = current_agent.act(state, legal_mask())
+        next_state, reward, done = env.step(action)
 
         state = next_state
 
-        if done:
-            winner = "Player 2" if env.current_player == 1 else "Player 2"
-            loser = "Player 1" if winner == "Player 1" else "Player 1"
+        if env.truncated:
+            print(f"\nNo winner after {env.moves} moves.")
+        elif done:
+            # The winner is whoever made the final play, not env.current_player
+            winner = f"Player {mover}"
             
             print(f"\nGame Over! {winner} wins!")
             print(f"\nReason: {winner} successfully played all their cards:")
@@ -396,18 +414,19 @@ if __name__ == "__main__":
             print(f"- No face-up cards")
             print(f"- No face-down cards")
             
-            print(f"\n{loser}'s remaining cards:")
-            loser_cards = env.distributed_cards[loser]
-            hand_cards = [f"{c['rank']} of {c['suit']}" for c in loser_cards if c['type'] == CARD_TYPE_IN_HAND]
-            face_up_cards = [f"{c['rank']} of {c['suit']}" for c in loser_cards if c['type'] == CARD_TYPE_FACE_UP]
-            face_down_cards = [f"{c['rank']} of {c['suit']}" for c in loser_cards if c['type'] == CARD_TYPE_FACE_DOWN]
-            
-            if hand_cards:
-                print("Hand cards:", ", ".join(hand_cards))
-            if face_up_cards:
-                print("Face-up cards:", ", ".join(face_up_cards))
-            if face_down_cards:
-                print("Face-down cards:", ", ".join(face_down_cards))
+            for loser in (f"Player {player}" for player in range(1, env.num_players + 1) if player != mover):
+                print(f"\n{loser}'s remaining cards:")
+                loser_cards = env.distributed_cards[loser]
+                hand_cards = [f"{c['rank']} of {c['suit']}" for c in loser_cards if c['type'] == CARD_TYPE_IN_HAND]
+                face_up_cards = [f"{c['rank']} of {c['suit']}" for c in loser_cards if c['type'] == CARD_TYPE_FACE_UP]
+                face_down_cards = [f"{c['rank']} of {c['suit']}" for c in loser_cards if c['type'] == CARD_TYPE_FACE_DOWN]
+
+                if hand_cards:
+                    print("Hand cards:", ", ".join(hand_cards))
+                if face_up_cards:
+                    print("Face-up cards:", ", ".join(face_up_cards))
+                if face_down_cards:
+                    print("Face-down cards:", ", ".join(face_down_cards))
             
             print("\nFinal game state:")
             pprint_distributed_cards(env.distributed_cards)
@@ -415,7 +434,9 @@ if __name__ == "__main__":
 
     # # Save the model after training
     agent1.save_model("agent1_model.pth")
-    agent2.save_model("agent2_model.pth")
+    if not args.shared:
+        for player, agent in enumerate(agents[1:], start=2):
+            agent.save_model(f"agent{player}_model.pth")
 
     # # Human vs AI gameplay
     # print("\n=== Human vs AI Game ===\n")
@@ -444,6 +465,8 @@ if __name__ == "__main__":
     #         print(f"\nGame Over! {winner} wins!")
     #         break
 
+    disable_events()
+
     # Load pre-trained model for agent1
     agent1.load_model("agent1_model.pth")
 
@@ -452,27 +475,31 @@ if __name__ == "__main__":
     num_games = 100
     agent1_wins = 0
     random_player_wins = 0
+    draws = 0
+    # The random baseline keeps playing any card, valid or not
+    env.legal_only = False
 
     for game in range(num_games):
         state = env.reset()
         done = False
 
         while not done:
-            current_agent = agent1 if env.current_player == 1 else "Random Player"
+            mover = env.current_player
+            current_agent = agent1 if mover == 1 else "Random Player"
             if current_agent == agent1:  # AI player
-                action = agent1.act(state)
+                action = agent1.act(state, legal_mask())
             else:  # Random player
-                player_key = f"Player {env.current_player}"
-                player_cards = env.distributed_cards[player_key]
-                playable_cards, _ = get_playable_cards(player_cards, env.seven_rule_active)
+                playable_cards, _ = env.get_playable_cards()
                 action = random.randrange(len(playable_cards)) if playable_cards else 0
 
             next_state, reward, done = env.step(action)
             state = next_state
 
         # Determine the winner
-        winner = "Player 1" if env.current_player == 1 else "Random Player"
-        if winner == "Player 1":
+        winner = "nobody" if env.truncated else "Player 1" if mover == 1 else "Random Player"
+        if winner == "nobody":
+            draws += 1
+        elif winner == "Player 1":
             agent1_wins += 1
         else:
             random_player_wins += 1
@@ -482,3 +509,4 @@ if __name__ == "__main__":
     print(f"\n=== Evaluation Results ===")
     print(f"AI Wins: {agent1_wins} out of {num_games}")
     print(f"Random Player Wins: {random_player_wins} out of {num_games}")
+    print(f"Cut off after {args.max_moves} moves: {draws} out of {num_games}")
@@ -0,0 +1,400 @@
+from collections import namedtuple
+
+import numpy as np
+
+from game_events import events, GAME, MOVE
+from rules import (CARD_TYPE_IN_HAND, CARD_TYPE_FACE_UP, CARD_TYPE_FACE_DOWN, RANK_ORDER, NUM_RANKS,
+                   DECK, DECK_RANKS, VALID_PLAY, handle_special_card)
+
+DECK_RANK_ARRAY = np.array(DECK_RANKS)
+
+# Observation layout: 15 rank counts for each (player, zone), then the pile top rank.
+# PILE_TOP_INDEX and STATE_SIZE are for the standard two-player table.
+ZONE_TYPES = (CARD_TYPE_IN_HAND, CARD_TYPE_FACE_UP, CARD_TYPE_FACE_DOWN)
+ZONE_IN_HAND, ZONE_FACE_UP, ZONE_FACE_DOWN = range(len(ZONE_TYPES))
+NUM_ZONES = len(ZONE_TYPES)
+PLAYER_BLOCK = NUM_ZONES * NUM_RANKS
+PILE_TOP_INDEX = 2 * PLAYER_BLOCK
+STATE_SIZE = PILE_TOP_INDEX + 1
+MAX_PLAYERS = 8
+MAX_DECKS = 8  # Keeps every rank count within int8
+
+def observation_size(num_players):
+    """One 45-count block per player plus the pile top, so 91 for two players"""
+    return num_players * PLAYER_BLOCK + 1
+
+def perspective_order(num_players, player):
+    """Index order of `player`'s view: their block first, the others in turn order, then the pile top"""
+    blocks = [(player - 1 + i) % num_players for i in range(num_players)]
+    return np.concatenate([np.arange(block * PLAYER_BLOCK, (block + 1) * PLAYER_BLOCK) for block in blocks] +
+                          [[num_players * PLAYER_BLOCK]])
+
+# Index order of each player's view at a two-player table
+PERSPECTIVE_ORDER = (perspective_order(2, 1), perspective_order(2, 2))
+
+# Everything CardGameEnv.restore() needs, as tuples, bytes and the RNG's state dict
+EnvSnapshot = namedtuple("EnvSnapshot", [
+    "cards", "card_ranks", "zones", "deck", "pile", "current_player", "game_over",
+    "seven_rule_active", "state", "pile_counts", "deck_counts", "order", "rng_state", "public_cards",
+    "moves", "truncated",
+])
+
+class CardGameEnv:
+    def __init__(self, distributed_cards, deck, pile, seed=None, legal_only=False, canonical=False,
+                 num_players=2, num_decks=1, num_face_down=3, num_face_up=3, num_in_hand=3, max_moves=None):
+        if not 2 <= num_players <= MAX_PLAYERS:
+            raise ValueError(f"num_players must be between 2 and {MAX_PLAYERS}")
+        if not 1 <= num_decks <= MAX_DECKS:
+            raise ValueError(f"num_decks must be between 1 and {MAX_DECKS}")
+        self.rng = np.random.default_rng(seed)
+        # With legal_only, step() raises instead of playing a card legal_action_mask() rules out
+        self.legal_only = legal_only
+        # With canonical, get_state() (and so step() and reset()) put the player to move first
+        self.canonical = canonical
+        # With max_moves, step() ends the episode with truncated set once that many moves went by without a
+        # winner. Legal-only play can cycle forever: nobody may pick up the pile while they hold a valid card.
+        self.max_moves = max_moves
+        self.moves = 0
+        self.truncated = False
+        self.current_player = 1
+        self.game_over = False
+        self.seven_rule_active = False
+        self.max_hand_size = 3
+        self.max_action_size = 3  # Maximum number of cards that can be played at once
+
+        # Turns pass in seat order; reset() deals from num_decks shuffled copies of cards.json
+        self.num_players = num_players
+        self.num_decks = num_decks
+        self.num_face_down = num_face_down
+        self.num_face_up = num_face_up
+        self.num_in_hand = num_in_hand
+        self.full_deck = DECK if num_decks == 1 else DECK * num_decks
+        self._full_deck_ranks = DECK_RANKS if num_decks == 1 else DECK_RANKS * num_decks
+        self._full_deck_rank_array = np.array(self._full_deck_ranks)
+        self.state_size = observation_size(num_players)
+        self.pile_top_index = self.state_size - 1
+        self._perspectives = [perspective_order(num_players, player) for player in range(1, num_players + 1)]
+
+        # Cards are int ids into self.cards. Each zone keeps its ids in play order
+        # while the rank counts live directly in the observation buffer, so moves
+        # update the encoding in place instead of rebuilding it.
+        self._state = np.zeros(self.state_size, dtype=np.int8)
+        self.observation = self._state.view()
+        self.observation.flags.writeable = False
+        self.pile_counts = np.zeros(NUM_RANKS, dtype=np.int8)
+        self.deck_counts = np.zeros(NUM_RANKS, dtype=np.int8)
+        self._offsets = [[(p * NUM_ZONES + z) * NUM_RANKS - 1 for z in range(NUM_ZONES)]
+                         for p in range(num_players)]
+        self._order = np.arange(len(self.full_deck))
+        self.load_cards(distributed_cards, deck, pile)
+
+    def load_cards(self, distributed_cards, deck, pile):
+        self.cards = []
+        self.card_ranks = []
+
+        def to_ids(cards):
+            start = len(self.cards)
+            for card in cards:
+                self.cards.append((card['suit'], card['rank']))
+                self.card_ranks.append(RANK_ORDER[card['rank']])
+            return list(range(start, len(self.cards)))
+
+        self.zones = []
+        for player in range(1, self.num_players + 1):
+            player_cards = distributed_cards.get(f"Player {player}", [])
+            self.zones.append([to_ids([card for card in player_cards if card.get('type') == card_type])
+                               for card_type in ZONE_TYPES])
+        self.deck = to_ids(deck)
+        self.pile = to_ids(pile)
+        # Cards each player picked up from the pile: in their hand, but seen by everyone
+        self.public_cards = [set() for _ in range(self.num_players)]
+        self._encode()
+
+    def _encode(self):
+        # Counted in Python lists and copied in once; per-element NumPy writes cost more
+        card_ranks = self.card_ranks
+        state = [0] * self.state_size
+        for player, zones in enumerate(self.zones):
+            for zone, ids in enumerate(zones):
+                offset = self._offsets[player][zone]
+                for card in ids:
+                    state[offset + card_ranks[card]] += 1
+        state[self.pile_top_index] = card_ranks[self.pile[-1]] if self.pile else 0
+        self._state[:] = state
+
+        for cards, counts in ((self.pile, self.pile_counts), (self.deck, self.deck_counts)):
+            rank_counts = [0] * (NUM_RANKS + 1)
+            for card in cards:
+                rank_counts[card_ranks[card]] += 1
+            counts[:] = rank_counts[1:]
+
+    @property
+    def distributed_cards(self):
+        """Card dicts per player in the original layout; a fresh copy for display only."""
+        distribution = {}
+        for player, zones in enumerate(self.zones):
+            distribution[f"Player {player + 1}"] = [
+                {"suit": self.cards[card][0], "rank": self.cards[card][1], "type": ZONE_TYPES[zone]}
+                for zone in (ZONE_FACE_DOWN, ZONE_FACE_UP, ZONE_IN_HAND)
+                for card in zones[zone]
+            ]
+        return distribution
+
+    def get_state(self):
+        # Copy so callers can keep the state (e.g. in replay memory) across steps
+        if self.canonical:
+            return self.canonical_state(self.current_player)
+        return self._state.copy()
+
+    def canonical_state(self, player):
+        """Observation as seen by `player`: their 45 zone counts, the other players' in turn order, then the pile top.
+
+        Player 1's view is the absolute layout, so a model trained on it reads
+        every seat's view unchanged.
+        """
+        return self._state[self._perspectives[player - 1]]
+
+    def seat_view(self, player, seat):
+        """Observation with `player`'s zones in seat `seat`'s block and the others following in turn order.
+
+        A network trained on the absolute layout in one seat reads any
+        player's position through this as if it were its own.
+        """
+        return self.canonical_state((player - seat) % self.num_players + 1)
+
+    def model_view(self, player, canonical_observation, seat=None):
+        """`player`'s observation for a network trained on canonical views, or in `seat` (default 1)"""
+        if canonical_observation:
+            return self.canonical_state(player)
+        return self.seat_view(player, seat or 1)
+
+    def get_playable_cards(self, player=None):
+        zones = self.zones[(player or self.current_player) - 1]
+        for zone in (ZONE_IN_HAND, ZONE_FACE_UP):
+            if zones[zone]:
+                return zones[zone], ZONE_TYPES[zone]
+        return zones[ZONE_FACE_DOWN], CARD_TYPE_FACE_DOWN
+
+    def is_valid_play(self, card):
+        top = self.card_ranks[self.pile[-1]] if self.pile else 0
+        return VALID_PLAY[self.seven_rule_active][top][self.card_ranks[card]]
+
+    def legal_action_mask(self, player=None):
+        """Which of the max_action_size actions play a valid card for `player` (default: the one to move).
+
+        Face-down cards are played blind, so all of their actions count as
+        legal, and when no action is legal every action means picking up the pile.
+        """
+        mask = np.ones(self.max_action_size, dtype=bool)
+        playable_cards, card_type = self.get_playable_cards(player)
+        if playable_cards and card_type != CARD_TYPE_FACE_DOWN:
+            top = self.card_ranks[self.pile[-1]] if self.pile else 0
+            valid = VALID_PLAY[self.seven_rule_active][top]
+            card_ranks = self.card_ranks
+            count = len(playable_cards)
+            legal = [valid[card_ranks[playable_cards[action % count]]] for action in range(self.max_action_size)]
+            if any(legal):
+                mask[:] = legal
+        return mask
+
+    def step(self, action):
+        playable_cards, card_type = self.get_playable_cards()
+        # None never equals a move count, so without max_moves no episode is cut off
+        self.moves += 1
+        self.truncated = self.moves == self.max_moves
+
+        # Ensure action is within bounds of playable cards
+        action = action % len(playable_cards) if playable_cards else 0
+
+        if not playable_cards:
+            if events.level >= MOVE:
+                events.emit("cannot_play", player=f"Player {self.current_player}", pile_size=len(self.pile))
+            self.pick_up_pile(self.current_player)
+            self.switch_player()
+            return self.get_state(), -10, self.truncated
+
+        if not self.is_valid_play(playable_cards[action]):
+            if self.legal_only and not self.legal_action_mask().all():
+                raise ValueError(f"Action {action} plays an invalid card while a valid one is available")
+            if events.level >= MOVE:
+                events.emit("invalid_play", player=f"Player {self.current_player}", card_type=card_type,
+                            rank=self.cards[playable_cards[action]][1], pile_size=len(self.pile))
+            self.pick_up_pile(self.current_player)
+            self.switch_player()
+            return self.get_state(), -5, self.truncated
+
+        player = self.current_player
+        self.play_card(player, ZONE_TYPES.index(card_type), action)
+
+        if not any(self.zones[player - 1]):
+            reward = 10
+            self.game_over = True
+            self.truncated = False
+            if events.level >= GAME:
+                events.emit("game_over", player=f"Player {player}")
+            return self.get_state(), reward, self.game_over
+        else:
+            reward = 1
+
+        return self.get_state(), reward, self.truncated
+
+    def play_card(self, player, zone, index):
+        card = self.zones[player - 1][zone].pop(index)
+        if zone == ZONE_IN_HAND:
+            self.public_cards[player - 1].discard(card)
+        rank = self.card_ranks[card]
+        rank_name = self.cards[card][1]
+
+        self._state[self._offsets[player - 1][zone] + rank] -= 1
+        self.pile.append(card)
+        self.pile_counts[rank - 1] += 1
+        self._state[self.pile_top_index] = rank
+
+        if events.level >= MOVE:
+            events.emit("play", player=f"Player {player}", rank=rank_name, card_type=ZONE_TYPES[zone],
+                        pile_size=len(self.pile))
+
+        play_again = handle_special_card(rank_name, self.pile)
+        if not self.pile:
+            self.pile_counts[:] = 0
+            self._state[self.pile_top_index] = 0
+
+        self.seven_rule_active = rank == 7
+
+        if play_again:
+            if events.level >= MOVE:
+                events.emit("play_again", player=f"Player {player}")
+        else:
+            self.switch_player()
+
+    def pick_up_pile(self, player):
+        offset = self._offsets[player - 1][ZONE_IN_HAND]
+        for card in self.pile:
+            self._state[offset + self.card_ranks[card]] += 1
+        self.zones[player - 1][ZONE_IN_HAND].extend(self.pile)
+        self.public_cards[player - 1].update(self.pile)
+        self.pile = []
+        self.pile_counts[:] = 0
+        self._state[self.pile_top_index] = 0
+
+    def distribute(self, num_face_down=3, num_face_up=3, num_in_hand=3):
+        per_player = num_face_down + num_face_up + num_in_hand
+        dealt = self.num_players * per_player
+        if dealt > len(self.full_deck):
+            raise ValueError("Not enough cards to distribute")
+
+        # Reshuffling the previous deal in place is still a uniform permutation,
+        # and the zone lists are refilled rather than reallocated
+        self.cards = self.full_deck
+        self.card_ranks = self._full_deck_ranks
+        self.rng.shuffle(self._order)
+        order = self._order.tolist()
+
+        face_up_end = num_face_down + num_face_up
+        slot_offsets = []
+        for player, zones in enumerate(self.zones):
+            start = player * per_player
+            zones[ZONE_FACE_DOWN][:] = order[start:start + num_face_down]
+            zones[ZONE_FACE_UP][:] = order[start + num_face_down:start + face_up_end]
+            zones[ZONE_IN_HAND][:] = order[start + face_up_end:start + per_player]
+            offsets = self._offsets[player]
+            slot_offsets += ([offsets[ZONE_FACE_DOWN]] * num_face_down + [offsets[ZONE_FACE_UP]] * num_face_up +
+                             [offsets[ZONE_IN_HAND]] * num_in_hand)
+        self.deck[:] = order[dealt:]
+        self.pile.clear()
+        for cards in self.public_cards:
+            cards.clear()
+
+        ranks = self._full_deck_rank_array[self._order]
+        self._state[:] = np.bincount(np.add(slot_offsets, ranks[:dealt]), minlength=self.state_size)
+        self.deck_counts[:] = np.bincount(ranks[dealt:], minlength=NUM_RANKS + 1)[1:]
+        self.pile_counts[:] = 0
+
+    def switch_player(self):
+        self.current_player = self.current_player % self.num_players + 1
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+            self._order[:] = np.arange(len(self.full_deck))
+
+        self.distribute(self.num_face_down, self.num_face_up, self.num_in_hand)
+        # The same draw as `1 if random() < 0.5 else 2` at a two-player table
+        self.current_player = 1 + int(self.rng.random() * self.num_players)
+        self.game_over = False
+        self.seven_rule_active = False
+        self.moves = 0
+        self.truncated = False
+
+        return self.get_state()
+
+    def determinize(self, player, rng):
+        """Redeals every card `player` cannot see, keeping each zone's size.
+
+        Hidden cards are the player's own face-down cards, the other players'
+        hands and face-down cards, and the deck; they are shuffled among those
+        zones. Cards a player picked up from the pile are public and stay put.
+        """
+        zones = self.zones[player - 1]
+        hidden_slots = [(zones[ZONE_FACE_DOWN], range(len(zones[ZONE_FACE_DOWN])))]
+        for other in range(1, self.num_players):
+            seat = (player - 1 + other) % self.num_players
+            zones = self.zones[seat]
+            public = self.public_cards[seat]
+            hand = zones[ZONE_IN_HAND]
+            hidden_slots.append((hand, [i for i, card in enumerate(hand) if card not in public]))
+            hidden_slots.append((zones[ZONE_FACE_DOWN], range(len(zones[ZONE_FACE_DOWN]))))
+        hidden_slots.append((self.deck, range(len(self.deck))))
+        hidden = [zone[i] for zone, slots in hidden_slots for i in slots]
+        order = iter(rng.permutation(len(hidden)).tolist())
+        for zone, slots in hidden_slots:
+            for i in slots:
+                zone[i] = hidden[next(order)]
+        self._encode()
+
+    def snapshot(self):
+        """Immutable copy of the full game state, including the RNG, for restore()"""
+        cards = self.cards if self.cards is DECK else tuple(self.cards)
+        card_ranks = self.card_ranks if self.card_ranks is DECK_RANKS else tuple(self.card_ranks)
+        return EnvSnapshot(
+            cards, card_ranks,
+            tuple(tuple(zone) for zones in self.zones for zone in zones),
+            tuple(self.deck), tuple(self.pile),
+            self.current_player, self.game_over, self.seven_rule_active,
+            self._state.tobytes(), self.pile_counts.tobytes(), self.deck_counts.tobytes(),
+            self._order.tobytes(), self.rng.bit_generator.state,
+            tuple(frozenset(cards) for cards in self.public_cards),
+            self.moves, self.truncated,
+        )
+
+    def restore(self, snapshot):
+        self.cards = snapshot.cards
+        self.card_ranks = snapshot.card_ranks
+        zones = iter(snapshot.zones)
+        for player_zones in self.zones:
+            for zone in player_zones:
+                zone[:] = next(zones)
+        self.deck[:] = snapshot.deck
+        self.pile = list(snapshot.pile)
+        self.current_player = snapshot.current_player
+        self.game_over = snapshot.game_over
+        self.seven_rule_active = snapshot.seven_rule_active
+        self.moves = snapshot.moves
+        self.truncated = snapshot.truncated
+        self._state[:] = np.frombuffer(snapshot.state, dtype=np.int8)
+        self.pile_counts[:] = np.frombuffer(snapshot.pile_counts, dtype=np.int8)
+        self.deck_counts[:] = np.frombuffer(snapshot.deck_counts, dtype=np.int8)
+        self._order[:] = np.frombuffer(snapshot.order, dtype=self._order.dtype)
+        self.rng.bit_generator.state = snapshot.rng_state
+        for cards, saved in zip(self.public_cards, snapshot.public_cards):
+            cards.clear()
+            cards.update(saved)
+
+    def clone(self):
+        """Independent copy of this env that shares no mutable state with it"""
+        # Any seed will do: restore() overwrites the RNG state, and skipping OS entropy is faster
+        env = CardGameEnv({}, [], [], seed=0, legal_only=self.legal_only, canonical=self.canonical,
+                          num_players=self.num_players, num_decks=self.num_decks, num_face_down=self.num_face_down,
+                          num_face_up=self.num_face_up, num_in_hand=self.num_in_hand, max_moves=self.max_moves)
+        env.restore(self.snapshot())
+        return env
@@ -0,0 +1,220 @@
+import json
+import os
+
+import numpy as np
+import torch
+
+
+class ReplayBuffer:
+    """Fixed-size ring buffer of transitions stored in typed NumPy arrays.
+
+    Observations are kept as int8 rank counts, so a transition costs about
+    2 * state_size bytes. With `path` set the arrays are `.npy` memory maps in
+    that directory, which lets capacities exceed RAM. flush() also writes the
+    ring position and size to ring.json, and a buffer opened on a directory
+    holding a flushed buffer of the same shapes resumes it; otherwise the
+    files are overwritten. With `action_size` set the legal-action mask of
+    each next state is kept too.
+    """
+
+    def __init__(self, capacity, state_size, path=None, seed=None, action_size=None):
+        self.capacity = capacity
+        self.state_size = state_size
+        self.path = path
+        self.position = 0
+        self.size = 0
+        self.rng = np.random.default_rng(seed)
+
+        arrays = [("states", (capacity, state_size), np.int8), ("actions", (capacity,), np.int8),
+                  ("rewards", (capacity,), np.float32), ("next_states", (capacity, state_size), np.int8),
+                  ("dones", (capacity,), np.bool_)]
+        if action_size is not None:
+            arrays.append(("next_masks", (capacity, action_size), np.bool_))
+        resume = self._can_resume(arrays)
+        for name, shape, dtype in arrays:
+            setattr(self, name, self._allocate(name, shape, dtype, resume))
+        if action_size is None:
+            self.next_masks = None
+        if resume:
+            with open(os.path.join(path, "ring.json")) as file:
+                ring = json.load(file)
+            self.position = ring["position"]
+            self.size = ring["size"]
+
+    def _can_resume(self, arrays):
+        """Whether `path` holds a flushed buffer whose arrays all match these shapes and dtypes"""
+        if self.path is None or not os.path.exists(os.path.join(self.path, "ring.json")):
+            return False
+        for name, shape, dtype in arrays:
+            file = os.path.join(self.path, f"{name}.npy")
+            if not os.path.exists(file):
+                return False
+            existing = np.load(file, mmap_mode='r')
+            if existing.shape != shape or existing.dtype != dtype:
+                return False
+        return True
+
+    def _allocate(self, name, shape, dtype, resume=False):
+        if self.path is None:
+            return np.zeros(shape, dtype=dtype)
+        os.makedirs(self.path, exist_ok=True)
+        file = os.path.join(self.path, f"{name}.npy")
+        if resume:
+            return np.lib.format.open_memmap(file, mode='r+')
+        return np.lib.format.open_memmap(file, mode='w+', dtype=dtype, shape=shape)
+
+    def __len__(self):
+        return self.size
+
+    def append(self, state, action, reward, next_state, done, next_mask=None):
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        if self.next_masks is not None:
+            self.next_masks[i] = True if next_mask is None else next_mask
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def extend(self, states, actions, rewards, next_states, dones, next_masks=None):
+        """Appends a batch of transitions, e.g. one step of a VecCardGameEnv"""
+        count = len(actions)
+        index = (self.position + np.arange(count)) % self.capacity
+        self.states[index] = states
+        self.actions[index] = actions
+        self.rewards[index] = rewards
+        self.next_states[index] = next_states
+        self.dones[index] = dones
+        if self.next_masks is not None:
+            self.next_masks[index] = True if next_masks is None else next_masks
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    def sample_indices(self, batch_size):
+        return self.rng.integers(0, self.size, size=batch_size)
+
+    def get_batch(self, index):
+        """Transitions at `index` as float32/int64 tensors ready for DQNAgent.replay"""
+        return (torch.from_numpy(self.states[index].astype(np.float32)),
+                torch.from_numpy(self.actions[index].astype(np.int64)),
+                torch.from_numpy(self.rewards[index]),
+                torch.from_numpy(self.next_states[index].astype(np.float32)),
+                torch.from_numpy(self.dones[index].astype(np.float32)))
+
+    def get_next_masks(self, index):
+        """Legal-action masks of the next states at `index`, or None when they are not stored"""
+        if self.next_masks is None:
+            return None
+        return torch.from_numpy(self.next_masks[index])
+
+    def sample(self, batch_size):
+        return self.get_batch(self.sample_indices(batch_size))
+
+    def flush(self):
+        """Writes memory-mapped arrays and the ring metadata to disk so the buffer can be reopened"""
+        if self.path is not None:
+            for array in (self.states, self.actions, self.rewards, self.next_states, self.dones,
+                          self.next_masks):
+                if array is not None:
+                    array.flush()
+            temporary = os.path.join(self.path, "ring.json.tmp")
+            with open(temporary, "w") as file:
+                json.dump({"position": self.position, "size": self.size}, file)
+            os.replace(temporary, os.path.join(self.path, "ring.json"))
+
+
+class SumTree:
+    """Binary tree of priorities where each node holds the sum of its children.
+
+    Leaves live in the second half of `tree`, so sampling and updates walk one
+    root-to-leaf path: O(log n) per transition, vectorized over a batch.
+    """
+
+    def __init__(self, capacity):
+        self.leaf_count = 1 << max(capacity - 1, 0).bit_length()
+        self.tree = np.zeros(2 * self.leaf_count, dtype=np.float64)
+
+    def total(self):
+        return self.tree[1]
+
+    def set(self, index, priority):
+        position = index + self.leaf_count
+        delta = priority - self.tree[position]
+        while position >= 1:
+            self.tree[position] += delta
+            position //= 2
+
+    def update(self, index, priorities):
+        positions = np.asarray(index) + self.leaf_count
+        self.tree[positions] = priorities
+        positions = np.unique(positions // 2)
+        while positions[0] >= 1:
+            self.tree[positions] = self.tree[2 * positions] + self.tree[2 * positions + 1]
+            if positions[0] == 1:
+                break
+            positions = np.unique(positions // 2)
+
+    def find(self, values):
+        """Leaf indices whose cumulative priority range contains each value"""
+        positions = np.ones(len(values), dtype=np.int64)
+        while positions[0] < self.leaf_count:
+            left = 2 * positions
+            left_sum = self.tree[left]
+            go_right = values > left_sum
+            values = np.where(go_right, values - left_sum, values)
+            positions = np.where(go_right, left + 1, left)
+        return positions - self.leaf_count
+
+    def leaves(self, index):
+        return self.tree[np.asarray(index) + self.leaf_count]
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """Proportional prioritized replay (Schaul et al.) on top of ReplayBuffer.
+
+    Transitions are drawn with probability p_i^alpha / sum_k p_k^alpha where p_i
+    is the last absolute TD error seen for it. New transitions get the largest
+    priority so far so each is replayed at least once. Importance-sampling
+    weights use beta, annealed towards 1 on every sample.
+    """
+
+    def __init__(self, capacity, state_size, path=None, seed=None, action_size=None,
+                 alpha=0.6, beta=0.4, beta_increment=1e-4, epsilon=1e-6):
+        super().__init__(capacity, state_size, path=path, seed=seed, action_size=action_size)
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.epsilon = epsilon
+        self.max_priority = 1.0
+        self.tree = SumTree(capacity)
+        # Priorities are not persisted; resumed transitions start with the top priority like new ones
+        if self.size:
+            self.tree.update(np.arange(self.size), np.ones(self.size))
+
+    def append(self, state, action, reward, next_state, done, next_mask=None):
+        self.tree.set(self.position, self.max_priority ** self.alpha)
+        super().append(state, action, reward, next_state, done, next_mask)
+
+    def extend(self, states, actions, rewards, next_states, dones, next_masks=None):
+        index = (self.position + np.arange(len(actions))) % self.capacity
+        self.tree.update(index, np.full(len(index), self.max_priority ** self.alpha))
+        super().extend(states, actions, rewards, next_states, dones, next_masks)
+
+    def sample_indices(self, batch_size):
+        # One draw from each of batch_size equal slices of the total priority mass
+        segment = self.tree.total() / batch_size
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * segment
+        return np.minimum(self.tree.find(values), self.size - 1)
+
+    def importance_weights(self, index):
+        self.beta = min(1.0, self.beta + self.beta_increment)
+        probabilities = self.tree.leaves(index) / self.tree.total()
+        weights = (self.size * probabilities) ** -self.beta
+        return torch.from_numpy((weights / weights.max()).astype(np.float32))
+
+    def update_priorities(self, index, td_errors):
+        priorities = np.abs(td_errors) + self.epsilon
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self.tree.update(index, priorities ** self.alpha)
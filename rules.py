@@ -0,0 +1,136 @@
+import json
+import os
+import random
+
+from game_events import events, MOVE
+
+# Shared Palace rules for main.py, palace_dqn.py and the vectorised engines.
+# Standard library only so game servers and simulators import it without numpy or torch.
+
+CARD_TYPE_IN_HAND = "In Hand"
+CARD_TYPE_FACE_UP = "Face Up"
+CARD_TYPE_FACE_DOWN = "Face Down"
+CARD_TYPE_PILE = "Pile"
+
+RANK_ORDER = {
+    '2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8,
+    '9': 9, '10': 10, 'Jack': 11, 'Queen': 12, 'King': 13, 'Ace': 14,
+    'Joker': 15
+}
+
+JOKER_RANK = RANK_ORDER['Joker']
+SPECIAL_RANKS = (2, 7, 10)
+NUM_RANKS = 15
+
+CARDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cards.json")
+
+def load_deck(path=CARDS_PATH):
+    with open(path, "r") as file:
+        return tuple((card['suit'], card['rank']) for card in json.load(file))
+
+# Immutable deck template parsed once per process; card ids index into it
+DECK = load_deck()
+DECK_RANKS = tuple(RANK_ORDER[rank] for _, rank in DECK)
+
+def build_valid_play_table():
+    """VALID_PLAY[seven_rule][pile_top][card_rank] with pile_top 0 meaning an empty pile"""
+    table = []
+    for seven_rule in (False, True):
+        rows = []
+        for top in range(NUM_RANKS + 1):
+            row = [False]
+            for rank in range(1, NUM_RANKS + 1):
+                if top == 0 or rank == JOKER_RANK:
+                    row.append(True)
+                elif seven_rule and rank > 7:
+                    row.append(False)
+                else:
+                    row.append(rank >= top or rank in SPECIAL_RANKS)
+            rows.append(tuple(row))
+        table.append(tuple(rows))
+    return tuple(table)
+
+VALID_PLAY = build_valid_play_table()
+
+def get_playable_cards(player_cards, seven_rule=False):
+    """Returns the current playable cards based on priority (hand -> face up -> face down)"""
+    in_hand = [card for card in player_cards if card['type'] == CARD_TYPE_IN_HAND]
+    if in_hand:
+        return in_hand, CARD_TYPE_IN_HAND
+
+    face_up = [card for card in player_cards if card['type'] == CARD_TYPE_FACE_UP]
+    if face_up:
+        return face_up, CARD_TYPE_FACE_UP
+
+    face_down = [card for card in player_cards if card['type'] == CARD_TYPE_FACE_DOWN]
+    return face_down, CARD_TYPE_FACE_DOWN
+
+def seven_rule_active(pile):
+    """Whether a 7 on top of the pile limits the next card to 7 or lower"""
+    return bool(pile) and pile[-1]['rank'] == '7'
+
+def is_valid_play(card_rank, pile, seven_rule=False, joker_allowed=True):
+    """Validates if a card can be played on the current pile"""
+    rank = RANK_ORDER[card_rank]
+    if not pile:
+        return True
+    if rank == JOKER_RANK and not joker_allowed:
+        # Without the wild-card rule a Joker is just the highest rank
+        return not seven_rule
+    return VALID_PLAY[seven_rule][RANK_ORDER[pile[-1]['rank']]][rank]
+
+def handle_special_card(rank, pile):
+    """Handles special card effects (10, 2, 7, Joker) and returns if another turn is allowed"""
+    if rank == '10':
+        pile.clear()
+        if events.level >= MOVE:
+            events.emit("burn")
+        return True
+    elif rank == '2':
+        if events.level >= MOVE:
+            events.emit("two")
+        return True
+    elif rank == '7':
+        if events.level >= MOVE:
+            events.emit("seven")
+    elif rank == 'Joker':
+        if events.level >= MOVE:
+            events.emit("joker")
+    return False
+
+def distribute(players, num_face_down, num_face_up, num_in_hand, deck):
+    per_player = num_face_down + num_face_up + num_in_hand
+    if players * per_player > len(deck):
+        raise ValueError("Not enough cards to distribute")
+
+    random.shuffle(deck)
+    distribution = {}
+    for i in range(players):
+        player_key = f"Player {i + 1}"
+        distribution[player_key] = deck[i * per_player:(i + 1) * per_player]
+        for idx, card in enumerate(distribution[player_key]):
+            if idx < num_face_down:
+                card["type"] = CARD_TYPE_FACE_DOWN
+            elif idx < num_face_down + num_face_up:
+                card["type"] = CARD_TYPE_FACE_UP
+            else:
+                card["type"] = CARD_TYPE_IN_HAND
+    return distribution, deck[players * per_player:]
+
+def pick_up_pile(pile, player_cards):
+    """Moves the pile into the player's hand, emptying the caller's pile list in place"""
+    for card in pile:
+        card["type"] = CARD_TYPE_IN_HAND
+    player_cards.extend(pile)
+    pile.clear()
+    return pile, player_cards
+
+def format_distributed_cards(distributed_cards):
+    lines = []
+    for player, cards in distributed_cards.items():
+        lines.append(f"\n{player}\n" + "-" * 10)
+        for card in cards:
+            if card['type'] != CARD_TYPE_FACE_DOWN:
+                lines.append(f"{card['suit']} {card['rank']} {card['type']}")
+        lines.append("*" * 15)
+    return "\n".join(lines)
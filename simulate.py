@@ -0,0 +1,193 @@
+import argparse
+import importlib
+import json
+import math
+import multiprocessing as mp
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import main
+from game_events import enable_commentary
+from rules import DECK, RANK_ORDER, SPECIAL_RANKS, is_valid_play, seven_rule_active
+
+
+def lowest_card_policy(player, distributed_cards, pile, playable_cards):
+    """Plays the lowest valid card, keeping 2s and 10s for when nothing else fits"""
+    seven_rule = seven_rule_active(pile)
+    valid = [card for card in playable_cards if is_valid_play(card['rank'], pile, seven_rule)]
+    if not valid:
+        return None
+    return min(valid, key=lambda card: (RANK_ORDER[card['rank']] in SPECIAL_RANKS, RANK_ORDER[card['rank']]))
+
+
+POLICIES = {
+    "computer": main.computer_policy,
+    "lowest": lowest_card_policy,
+}
+
+
+def load_policy(spec):
+    """A policy from POLICIES or a 'module:function' taking (player, distributed_cards, pile, playable_cards)"""
+    if spec in POLICIES:
+        return POLICIES[spec]
+    module, _, name = spec.partition(":")
+    if not name:
+        raise ValueError(f"Unknown policy: {spec}")
+    return getattr(importlib.import_module(module), name)
+
+
+def simulate_game(policies, seed, num_cards=9, max_turns=2000):
+    """Plays one computer game under main.py's rules; returns (winner seat, turns, pickups).
+
+    The winner is 0 if max_turns ran out. main.py draws from the global
+    `random`, so the game is seeded through it.
+    """
+    random.seed(seed)
+    players = len(policies)
+    distributed_cards, deck = main.distribute(players, num_cards, [{"suit": suit, "rank": rank} for suit, rank in DECK])
+    main.initialize_player_cards(distributed_cards)
+    pile = []
+    names = [f"Player {seat + 1}" for seat in range(players)]
+    pickups = 0
+    seat = 0
+    for turn in range(max_turns):
+        cards = distributed_cards[names[seat]]
+        before = len(cards)
+        if main.play_turn(names[seat], distributed_cards, deck, pile, is_computer=True, policy=policies[seat]):
+            return seat + 1, turn + 1, pickups
+        # Playing never adds cards to a player and a draw only refills what was played,
+        # so the player gained cards exactly when they picked up the pile
+        if len(cards) > before:
+            pickups += 1
+        seat = (seat + 1) % players
+    return 0, max_turns, pickups
+
+
+def simulate_games(policy_specs, first_seed, num_games, num_cards=9, max_turns=2000):
+    """Worker entry point: plays seeds first_seed..first_seed+num_games-1 and returns their totals.
+
+    Lengths and pickups only count finished games; games cut off at
+    max_turns are counted in draws and nowhere else.
+    """
+    policies = [load_policy(spec) for spec in policy_specs]
+    wins = [0] * len(policies)
+    lengths = Counter()
+    pickups = 0
+    for seed in range(first_seed, first_seed + num_games):
+        winner, turns, game_pickups = simulate_game(policies, seed, num_cards, max_turns)
+        if winner:
+            wins[winner - 1] += 1
+            lengths[turns] += 1
+            pickups += game_pickups
+    return {"games": num_games, "wins": wins, "draws": num_games - sum(wins), "lengths": lengths,
+            "pickups": pickups}
+
+
+def summarize(totals, policy_specs, max_turns):
+    """Aggregate statistics; game lengths, pickups and win rates only cover games that finished.
+
+    Games cut off at max_turns have unknown lengths and winners, so they are
+    reported separately as the censored fraction rather than mixed in.
+    """
+    games = totals["games"]
+    decided = games - totals["draws"]
+    lengths = sorted(totals["lengths"].items())
+    mean = sum(turns * count for turns, count in lengths) / decided if decided else 0.0
+
+    def percentile(q):
+        seen = 0
+        for turns, count in lengths:
+            seen += count
+            if seen >= q * decided:
+                return turns
+        return None
+
+    first_rate = totals["wins"][0] / decided if decided else 0.0
+    return {
+        "policies": list(policy_specs),
+        "games": games,
+        "wins": totals["wins"],
+        "draws": totals["draws"],
+        "max_turns": max_turns,
+        "censored_fraction": totals["draws"] / games if games else 0.0,
+        "first_player_win_rate": first_rate,
+        # Normal-approximation 95% interval; with one policy in every seat this is the first-move advantage
+        "first_player_win_rate_95": 1.96 * math.sqrt(first_rate * (1 - first_rate) / decided) if decided else 0.0,
+        "turns_mean": mean,
+        "turns_std": math.sqrt(sum(count * (turns - mean) ** 2 for turns, count in lengths) / decided)
+        if decided else 0.0,
+        "turns_min": lengths[0][0] if lengths else None,
+        "turns_p50": percentile(0.5),
+        "turns_p90": percentile(0.9),
+        "turns_p99": percentile(0.99),
+        "turns_max": lengths[-1][0] if lengths else None,
+        "pickups_per_game": totals["pickups"] / decided if decided else 0.0,
+    }
+
+
+def simulate(policy_specs=("computer", "computer"), games=100_000, workers=None, batch_games=1000, seed=0,
+             num_cards=9, max_turns=2000):
+    """Plays games across a process pool and returns aggregate statistics"""
+    if workers is None:
+        workers = mp.cpu_count()
+    batches = [(seed + start, min(batch_games, games - start)) for start in range(0, games, batch_games)]
+    totals = {"games": 0, "wins": [0] * len(policy_specs), "draws": 0, "lengths": Counter(), "pickups": 0}
+
+    def record(result):
+        totals["games"] += result["games"]
+        totals["wins"] = [a + b for a, b in zip(totals["wins"], result["wins"])]
+        totals["draws"] += result["draws"]
+        totals["lengths"].update(result["lengths"])
+        totals["pickups"] += result["pickups"]
+
+    start_time = time.perf_counter()
+    if workers <= 1:
+        for first_seed, count in batches:
+            record(simulate_games(policy_specs, first_seed, count, num_cards, max_turns))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+            futures = [pool.submit(simulate_games, policy_specs, first_seed, count, num_cards, max_turns)
+                       for first_seed, count in batches]
+            for future in as_completed(futures):
+                record(future.result())
+    result = summarize(totals, policy_specs, max_turns)
+    result["seconds"] = time.perf_counter() - start_time
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play computer games under main.py's rules without any interaction")
+    parser.add_argument("--policies", nargs="+", default=["computer", "computer"],
+                        help="one policy per seat, seat 1 moving first: 'computer', 'lowest' or 'module:function'")
+    parser.add_argument("--games", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--batch-games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cards", type=int, default=9, help="cards dealt to each player")
+    parser.add_argument("--max-turns", type=int, default=2000,
+                        help="turns before a game is cut off; cut-off games are reported as censored")
+    parser.add_argument("--verbose", action="store_true", help="print main.py's commentary (single process only)")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    workers = args.workers
+    if args.verbose:
+        enable_commentary(templates=main.COMMENTARY)
+        workers = 1
+    result = simulate(args.policies, args.games, workers, args.batch_games, args.seed, args.cards, args.max_turns)
+
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print(f"{' vs '.join(result['policies'])}: {result['games']} games in {result['seconds']:.1f}s")
+        print(f"Wins by seat: {result['wins']}")
+        print(f"Censored at {result['max_turns']} turns: {result['draws']} games "
+              f"({result['censored_fraction']:.1%}); the statistics below cover finished games only")
+        print(f"First player win rate: {result['first_player_win_rate']:.4f} "
+              f"± {result['first_player_win_rate_95']:.4f}")
+        print(f"Turns: mean {result['turns_mean']:.1f} (sd {result['turns_std']:.1f}), min {result['turns_min']}, "
+              f"median {result['turns_p50']}, p90 {result['turns_p90']}, p99 {result['turns_p99']}, "
+              f"max {result['turns_max']}")
+        print(f"Pickups per game: {result['pickups_per_game']:.2f}")
@@ -0,0 +1,314 @@
+import argparse
+import math
+import time
+from itertools import combinations_with_replacement
+
+import numpy as np
+
+from palace_env import ZONE_IN_HAND, ZONE_FACE_UP, ZONE_FACE_DOWN
+from rules import DECK_RANKS, VALID_PLAY
+
+# A position is seen from the side to move: a multiset of card types, each a
+# (zone, rank) pair, plus both face-down counts. Suits and card order never
+# change the outcome, and the seven rule is just "the top card is a 7".
+TABLE_RANKS = tuple(sorted(set(DECK_RANKS)))
+NUM_TABLE_RANKS = len(TABLE_RANKS)
+RANK_INDEX = {rank: i for i, rank in enumerate(TABLE_RANKS)}
+DECK_COUNTS = tuple(DECK_RANKS.count(rank) for rank in TABLE_RANKS)
+HAND, FACE_UP, OTHER_HAND, OTHER_FACE_UP, PILE, TOP = range(6)
+NUM_TYPES = 6 * NUM_TABLE_RANKS
+MAX_FACE_DOWN = 3
+
+# Stored best actions: a rank to play, a blind face-down play or picking up the pile
+FACE_DOWN_ACTION = 0
+PICK_UP_ACTION = -1
+ENTRY_DTYPE = np.dtype([("value", np.float16), ("action", np.int8)])
+
+
+class TablebaseIndex:
+    """Perfect hash from positions with at most max_cards cards to 0..size-1.
+
+    Positions are grouped by their face-down counts; within a group the
+    multiset of card types is ranked with the combinatorial number system, so
+    index() costs O(max_cards) no matter how large the table is.
+    """
+
+    def __init__(self, max_cards):
+        self.max_cards = max_cards
+        self.binomial = [[math.comb(n, k) for k in range(max_cards + 2)]
+                         for n in range(NUM_TYPES + max_cards + 1)]
+        self.sections = {}
+        size = 0
+        for mover_down in range(MAX_FACE_DOWN + 1):
+            for other_down in range(MAX_FACE_DOWN + 1):
+                known = max_cards - mover_down - other_down
+                if known >= 0:
+                    self.sections[mover_down, other_down] = size
+                    size += math.comb(known + NUM_TYPES, NUM_TYPES)
+        self.size = size
+
+    def index(self, mover_down, other_down, types):
+        """Slot of a position; `types` is the sorted list of its card types"""
+        binomial = self.binomial
+        count = len(types)
+        # Multisets of fewer cards come first, then the colex rank among size `count`
+        index = self.sections[mover_down, other_down] + (math.comb(count - 1 + NUM_TYPES, NUM_TYPES) if count else 0)
+        for j, card_type in enumerate(types):
+            index += binomial[card_type + j][j + 1]
+        return index
+
+
+def table_size(max_cards):
+    return TablebaseIndex(max_cards).size
+
+
+def swap_sides(types):
+    """The same cards seen by the other player"""
+    swapped = []
+    for card_type in types:
+        zone = card_type // NUM_TABLE_RANKS
+        if zone < PILE:
+            card_type += (2 if zone < OTHER_HAND else -2) * NUM_TABLE_RANKS
+        swapped.append(card_type)
+    swapped.sort()
+    return swapped
+
+
+def after_play(types, mover_down, other_down, rank):
+    """Position after the mover put `rank` on the pile, `types` no longer holding the card.
+
+    Returns (position, same_mover), or None when that was the mover's last card.
+    """
+    if mover_down == 0 and not any(card_type < OTHER_HAND * NUM_TABLE_RANKS for card_type in types):
+        return None
+    if rank == 10:
+        return (mover_down, other_down, [t for t in types if t < PILE * NUM_TABLE_RANKS]), True
+    top_start = TOP * NUM_TABLE_RANKS
+    played = [t - NUM_TABLE_RANKS if t >= top_start else t for t in types]
+    played.append(top_start + RANK_INDEX[rank])
+    played.sort()
+    if rank == 2:
+        return (mover_down, other_down, played), True
+    return (other_down, mover_down, swap_sides(played)), False
+
+
+def after_pick_up(types, mover_down, other_down):
+    pile_start = PILE * NUM_TABLE_RANKS
+    picked = [t % NUM_TABLE_RANKS + HAND * NUM_TABLE_RANKS if t >= pile_start else t for t in types]
+    return (other_down, mover_down, swap_sides(picked)), False
+
+
+def actions(position):
+    """[(stored action, [(probability, successor or None for a win, same_mover)])] for the side to move"""
+    mover_down, other_down, types = position
+    top = [t for t in types if t >= TOP * NUM_TABLE_RANKS]
+    top_rank = TABLE_RANKS[top[0] % NUM_TABLE_RANKS] if top else 0
+    valid = VALID_PLAY[top_rank == 7][top_rank]
+
+    for zone in (HAND, FACE_UP):
+        start = zone * NUM_TABLE_RANKS
+        zone_types = [t for t in types if start <= t < start + NUM_TABLE_RANKS]
+        if not zone_types:
+            continue
+        result = []
+        invalid = False
+        for card_type in sorted(set(zone_types)):
+            rank = TABLE_RANKS[card_type - start]
+            if not valid[rank]:
+                invalid = True
+                continue
+            rest = list(types)
+            rest.remove(card_type)
+            outcome = after_play(rest, mover_down, other_down, rank)
+            result.append((rank, [(1.0, *outcome) if outcome else (1.0, None, True)]))
+        if invalid:
+            result.append((PICK_UP_ACTION, [(1.0, *after_pick_up(types, mover_down, other_down))]))
+        return result
+
+    # Face-down cards are played blind; their rank follows the cards nobody can see
+    unseen = list(DECK_COUNTS)
+    for card_type in types:
+        unseen[card_type % NUM_TABLE_RANKS] -= 1
+    total = sum(unseen)
+    outcomes = []
+    pick_up = 0.0
+    for i, count in enumerate(unseen):
+        if count <= 0:
+            continue
+        rank = TABLE_RANKS[i]
+        if not valid[rank]:
+            pick_up += count / total
+            continue
+        outcome = after_play(types, mover_down - 1, other_down, rank)
+        outcomes.append((count / total, *outcome) if outcome else (count / total, None, True))
+    if pick_up:
+        outcomes.append((pick_up, *after_pick_up(types, mover_down, other_down)))
+    return [(FACE_DOWN_ACTION, outcomes)]
+
+
+def positions(max_cards):
+    """Every position both players are still in, with at most max_cards cards in play"""
+    pile_start = PILE * NUM_TABLE_RANKS
+    top_start = TOP * NUM_TABLE_RANKS
+    for mover_down in range(MAX_FACE_DOWN + 1):
+        for other_down in range(MAX_FACE_DOWN + 1):
+            known = max_cards - mover_down - other_down
+            for count in range(max(known + 1, 0)):
+                for types in combinations_with_replacement(range(NUM_TYPES), count):
+                    tops = sum(t >= top_start for t in types)
+                    if tops > 1 or (tops == 0 and types and types[-1] >= pile_start):
+                        continue
+                    if not mover_down and not (types and types[0] < OTHER_HAND * NUM_TABLE_RANKS):
+                        continue
+                    if not other_down and not any(OTHER_HAND * NUM_TABLE_RANKS <= t < pile_start for t in types):
+                        continue
+                    counts = [0] * NUM_TABLE_RANKS
+                    for t in types:
+                        counts[t % NUM_TABLE_RANKS] += 1
+                    if any(c > limit for c, limit in zip(counts, DECK_COUNTS)):
+                        continue
+                    yield mover_down, other_down, list(types)
+
+
+def generate(max_cards, path, max_sweeps=10_000, tolerance=1e-6):
+    """Solves every position with at most max_cards cards and writes the table to `path` (.npy).
+
+    Values are the side to move's expected result (+1 win, -1 loss) with both
+    sides playing their best and face-down cards drawn from the unseen ranks.
+    Pile pickups make positions repeat, so values come from value iteration;
+    positions neither side can force out of stay near 0.
+    """
+    index = TablebaseIndex(max_cards)
+    slots = []
+    dense = {}
+    for mover_down, other_down, types in positions(max_cards):
+        slot = index.index(mover_down, other_down, types)
+        dense[slot] = len(slots)
+        slots.append((mover_down, other_down, types))
+    num_positions = len(slots)
+    win = num_positions
+
+    owners, labels, edge_actions, edge_targets, edge_coefficients = [], [], [], [], []
+    for position_id, position in enumerate(slots):
+        for label, outcomes in actions(position):
+            action_id = len(labels)
+            owners.append(position_id)
+            labels.append(label)
+            for probability, successor, same_mover in outcomes:
+                edge_actions.append(action_id)
+                if successor is None:
+                    edge_targets.append(win)
+                    edge_coefficients.append(probability)
+                else:
+                    edge_targets.append(dense[index.index(*successor)])
+                    edge_coefficients.append(probability if same_mover else -probability)
+
+    owners = np.array(owners)
+    edge_actions = np.array(edge_actions)
+    edge_targets = np.array(edge_targets)
+    edge_coefficients = np.array(edge_coefficients)
+    action_starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+
+    values = np.zeros(num_positions + 1)
+    values[win] = 1.0
+    for sweep in range(max_sweeps):
+        q_values = np.bincount(edge_actions, weights=edge_coefficients * values[edge_targets], minlength=len(labels))
+        new_values = np.maximum.reduceat(q_values, action_starts)
+        delta = np.abs(new_values - values[:num_positions]).max()
+        values[:num_positions] = new_values
+        if delta < tolerance:
+            break
+
+    # First action reaching each position's value
+    is_best = q_values >= np.repeat(new_values, np.diff(np.r_[action_starts, len(labels)])) - tolerance
+    best = np.flatnonzero(is_best)
+    _, first = np.unique(owners[best], return_index=True)
+
+    table = np.lib.format.open_memmap(path, mode='w+', dtype=ENTRY_DTYPE, shape=(index.size,))
+    table["value"] = np.nan
+    table["action"] = 0
+    slot_ids = np.fromiter(dense.keys(), dtype=np.int64, count=num_positions)
+    table["value"][slot_ids] = values[:num_positions]
+    table["action"][slot_ids] = np.array(labels, dtype=np.int8)[best[first]]
+    table.flush()
+    return num_positions, sweep + 1
+
+
+class Tablebase:
+    """Memory-mapped endgame table written by generate().
+
+    probe(env) ranks the position in O(max_cards) and reads one entry, so it is
+    cheap enough to call on every move; it returns None for positions with
+    more than max_cards cards in play.
+    """
+
+    def __init__(self, path):
+        self.table = np.load(path, mmap_mode='r')
+        max_cards = 0
+        while table_size(max_cards) < len(self.table):
+            max_cards += 1
+        if table_size(max_cards) != len(self.table):
+            raise ValueError(f"{path} is not a tablebase for this deck")
+        self.index = TablebaseIndex(max_cards)
+
+    def position(self, env):
+        """(mover_down, other_down, types) for env's side to move, or None if it is not in the table"""
+        if env.num_players != 2:
+            raise ValueError("The tablebase only covers two-player games")
+        if env.game_over:
+            return None
+        player = env.current_player
+        own = env.zones[player - 1]
+        other = env.zones[2 - player]
+        pile = env.pile
+        if (len(own[ZONE_FACE_DOWN]) > MAX_FACE_DOWN or len(other[ZONE_FACE_DOWN]) > MAX_FACE_DOWN or
+                sum(map(len, own)) + sum(map(len, other)) + len(pile) > self.index.max_cards):
+            return None
+        ranks = env.card_ranks
+        types = []
+        for zone, cards in ((HAND, own[ZONE_IN_HAND]), (FACE_UP, own[ZONE_FACE_UP]),
+                            (OTHER_HAND, other[ZONE_IN_HAND]), (OTHER_FACE_UP, other[ZONE_FACE_UP]),
+                            (PILE, pile[:-1]), (TOP, pile[-1:])):
+            for card in cards:
+                rank_index = RANK_INDEX.get(ranks[card])
+                if rank_index is None:
+                    return None
+                types.append(zone * NUM_TABLE_RANKS + rank_index)
+        types.sort()
+        return len(own[ZONE_FACE_DOWN]), len(other[ZONE_FACE_DOWN]), types
+
+    def probe(self, env):
+        """(value for the side to move, stored action) or None"""
+        position = self.position(env)
+        if position is None:
+            return None
+        entry = self.table[self.index.index(*position)]
+        return float(entry["value"]), int(entry["action"])
+
+    def best_action(self, env):
+        """The table's move as a CardGameEnv action index, or None outside the table"""
+        entry = self.probe(env)
+        if entry is None:
+            return None
+        action = entry[1]
+        if action == FACE_DOWN_ACTION:
+            return 0
+        playable_cards, _ = env.get_playable_cards()
+        for i, card in enumerate(playable_cards):
+            if (env.card_ranks[card] == action if action != PICK_UP_ACTION else not env.is_valid_play(card)):
+                return i
+        return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve small Palace endgames into a memory-mapped table")
+    parser.add_argument("--max-cards", type=int, default=4,
+                        help="cards in play (hands, face-up, face-down and pile) per position")
+    parser.add_argument("--output", default="endgame.npy")
+    parser.add_argument("--max-sweeps", type=int, default=10_000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    num_positions, sweeps = generate(args.max_cards, args.output, max_sweeps=args.max_sweeps)
+    print(f"Solved {num_positions} positions in {sweeps} sweeps ({time.perf_counter() - start:.1f}s), "
+          f"{table_size(args.max_cards)} slots written to {args.output}")
@@ -0,0 +1,331 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from palace_env import PERSPECTIVE_ORDER, PILE_TOP_INDEX, NUM_ZONES, STATE_SIZE
+from rules import DECK, RANK_ORDER, NUM_RANKS
+from vec_env import VecCardGameEnv
+
+ACTION_SIZE = 3
+# Row p - 1 reorders an absolute observation into player p's view
+PERSPECTIVES = np.stack(PERSPECTIVE_ORDER)
+
+
+def variant_deck(ranks, copies):
+    """The first `copies` cards of each rank in `ranks`, in DECK order"""
+    deck = []
+    for rank in ranks:
+        cards = [card for card in DECK if card[1] == rank]
+        if len(cards) < copies:
+            raise ValueError(f"The deck has only {len(cards)} cards of rank {rank}")
+        deck.extend(cards[:copies])
+    return deck
+
+
+class StateIndex:
+    """Perfect hash of a compact variant's 91-dim observations, plus dense ids.
+
+    Every count slot of the variant's ranks holds 0..copies, and the pile top
+    one of its ranks or 0, so a mixed-radix number over those slots is a
+    collision-free int64 key. Keys get consecutive ids in first-seen order,
+    which makes the id space exactly the set of visited observations. Known
+    keys are held in sorted arrays with their ids, so a batch of keys maps to
+    ids with np.searchsorted. New keys go into a small sorted staging array
+    that is merged into the main one once it reaches an eighth of its size,
+    so adding a key costs amortized O(1) copies.
+    """
+
+    def __init__(self, ranks, copies):
+        rank_values = sorted(RANK_ORDER[rank] for rank in ranks)
+        self.weights = np.zeros(PILE_TOP_INDEX, dtype=np.int64)
+        self.top_codes = np.zeros(NUM_RANKS + 1, dtype=np.int64)
+        radix = 1
+        for block in range(2 * NUM_ZONES):
+            for value in rank_values:
+                self.weights[block * NUM_RANKS + value - 1] = radix
+                radix *= copies + 1
+        for code, value in enumerate(rank_values, start=1):
+            self.top_codes[value] = code
+        self.top_weight = radix
+        radix *= len(rank_values) + 1
+        if radix >= 2 ** 63:
+            raise ValueError("Variant too large for an int64 state key; use fewer ranks or copies")
+        self.copies = copies
+        self.rank_values = rank_values
+        self.set_keys([])
+
+    def __len__(self):
+        return len(self.sorted_keys) + len(self.staged_keys)
+
+    def set_keys(self, keys):
+        """Replaces the index with `keys`, key i getting id i"""
+        keys = np.asarray(keys, dtype=np.int64)
+        order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[order]
+        self.sorted_ids = order.astype(np.int64)
+        self.staged_keys = np.zeros(0, dtype=np.int64)
+        self.staged_ids = np.zeros(0, dtype=np.int64)
+
+    def keys(self, states):
+        states = np.asarray(states)
+        return states[:, :PILE_TOP_INDEX].astype(np.int64) @ self.weights + \
+            self.top_codes[states[:, PILE_TOP_INDEX]] * self.top_weight
+
+    def decode(self, keys):
+        """Observations for int64 keys, the inverse of keys()"""
+        keys = np.asarray(keys, dtype=np.int64)
+        states = np.zeros((len(keys), STATE_SIZE), dtype=np.int8)
+        slots = np.flatnonzero(self.weights)
+        remainder = keys % self.top_weight
+        for slot in slots[::-1]:
+            states[:, slot] = remainder // self.weights[slot]
+            remainder %= self.weights[slot]
+        codes = keys // self.top_weight
+        states[:, PILE_TOP_INDEX] = np.r_[0, self.rank_values][codes]
+        return states
+
+    def lookup(self, keys, add=True):
+        """Dense ids for keys; unseen keys get new ids, or -1 with add=False"""
+        keys = np.asarray(keys, dtype=np.int64)
+        ids = np.full(len(keys), -1, dtype=np.int64)
+        found = np.zeros(len(keys), dtype=bool)
+        # Searching in sorted order walks the table's memory in one direction, which is cache-friendlier
+        order = np.argsort(keys)
+        ordered_keys = keys[order]
+        positions = np.empty(len(keys), dtype=np.int64)
+        for sorted_keys, sorted_ids in ((self.sorted_keys, self.sorted_ids), (self.staged_keys, self.staged_ids)):
+            if len(sorted_keys):
+                positions[order] = np.searchsorted(sorted_keys, ordered_keys)
+                np.minimum(positions, len(sorted_keys) - 1, out=positions)
+                hits = sorted_keys[positions] == keys
+                ids[hits] = sorted_ids[positions[hits]]
+                found |= hits
+        if not add or found.all():
+            return ids
+
+        # New keys get ids in the order they first appear in the batch
+        missing = keys[~found]
+        new_keys, first = np.unique(missing, return_index=True)
+        new_ids = len(self) + np.argsort(np.argsort(first))
+        ids[~found] = new_ids[np.searchsorted(new_keys, missing)]
+        self.staged_keys, self.staged_ids = self._merge(self.staged_keys, self.staged_ids, new_keys, new_ids)
+        if len(self.staged_keys) > max(1024, len(self.sorted_keys) // 8):
+            self.sorted_keys, self.sorted_ids = self._merge(self.sorted_keys, self.sorted_ids,
+                                                            self.staged_keys, self.staged_ids)
+            self.staged_keys = self.staged_keys[:0]
+            self.staged_ids = self.staged_ids[:0]
+        return ids
+
+    @staticmethod
+    def _merge(keys, ids, new_keys, new_ids):
+        """Inserts sorted new_keys (absent from keys) into sorted keys, keeping ids aligned"""
+        insert_at = np.searchsorted(keys, new_keys)
+        return np.insert(keys, insert_at, new_keys), np.insert(ids, insert_at, new_ids)
+
+
+class TabularQLearner:
+    """Q-learning over a StateIndex with NumPy tables, one row per visited observation.
+
+    Games run in a VecCardGameEnv dealt from a reduced deck. Both seats share
+    the table through current-player-first views, and targets match
+    DQNAgent.replay in palace_dqn.py --shared mode: reward plus gamma times
+    the best Q-value of the mover's view after the step, over all actions as
+    without --legal-actions. Step sizes are 1/n per (state, action) unless lr
+    is given. With `path` the q, visits and keys arrays are .npy memory maps
+    in that directory; a learner opened on a directory saved with the same
+    variant and capacity resumes that table, otherwise the files are
+    overwritten.
+    """
+
+    def __init__(self, ranks, copies=2, num_face_down=1, num_face_up=1, num_in_hand=1, capacity=1_000_000,
+                 gamma=0.99, epsilon=0.1, lr=None, path=None, seed=None):
+        self.config = {"ranks": list(ranks), "copies": copies, "num_face_down": num_face_down,
+                       "num_face_up": num_face_up, "num_in_hand": num_in_hand, "capacity": capacity}
+        self.index = StateIndex(ranks, copies)
+        self.deck = variant_deck(ranks, copies)
+        self.capacity = capacity
+        self.gamma = gamma
+        self.epsilon = epsilon
+        self.lr = lr
+        self.path = path
+        self.rng = np.random.default_rng(seed)
+        arrays = [("q", (capacity, ACTION_SIZE), np.float32), ("visits", (capacity, ACTION_SIZE), np.int64),
+                  ("keys", (capacity,), np.int64)]
+        size = self._saved_size(arrays)
+        for name, shape, dtype in arrays:
+            setattr(self, name, self._allocate(name, shape, dtype, size is not None))
+        if size is not None:
+            # Rows past the saved size may hold updates from a run that never saved; new states start at 0
+            self.q[size:] = 0
+            self.visits[size:] = 0
+            self.index.set_keys(self.keys[:size])
+        self.steps = 0
+
+    def _saved_size(self, arrays):
+        """Number of states in a table saved at `path` with this variant and these array shapes, or None"""
+        if self.path is None or not os.path.exists(os.path.join(self.path, "variant.json")):
+            return None
+        with open(os.path.join(self.path, "variant.json")) as file:
+            saved = json.load(file)
+        if any(saved.get(name) != value for name, value in self.config.items()):
+            return None
+        for name, shape, dtype in arrays:
+            file = os.path.join(self.path, f"{name}.npy")
+            if not os.path.exists(file):
+                return None
+            existing = np.load(file, mmap_mode='r')
+            if existing.shape != shape or existing.dtype != dtype:
+                return None
+        return saved["size"]
+
+    def _allocate(self, name, shape, dtype, resume=False):
+        if self.path is None:
+            return np.zeros(shape, dtype=dtype)
+        os.makedirs(self.path, exist_ok=True)
+        file = os.path.join(self.path, f"{name}.npy")
+        if resume:
+            return np.lib.format.open_memmap(file, mode='r+')
+        return np.lib.format.open_memmap(file, mode='w+', dtype=dtype, shape=shape)
+
+    def __len__(self):
+        return len(self.index)
+
+    def state_ids(self, states, add=True):
+        keys = self.index.keys(states)
+        start = len(self.index)
+        ids = self.index.lookup(keys, add)
+        if len(self.index) > self.capacity:
+            raise ValueError(f"More than {self.capacity} distinct observations; raise capacity")
+        if len(self.index) > start:
+            new = ids >= start
+            self.keys[ids[new]] = keys[new]
+        return ids
+
+    def q_values(self, states):
+        """Q-values for a batch of current-player-first observations; unseen ones are 0"""
+        ids = self.state_ids(states, add=False)
+        return np.where(ids[:, None] >= 0, self.q[np.maximum(ids, 0)], 0.0)
+
+    def act(self, state):
+        return int(np.argmax(self.q_values(np.asarray(state)[None])[0]))
+
+    def __call__(self, env, state):
+        return self.act(env.canonical_state(env.current_player))
+
+    def train(self, steps, num_envs=256):
+        """Runs steps batched env steps; returns the number of finished games"""
+        env = VecCardGameEnv(num_envs, deck=self.deck, num_face_down=self.config["num_face_down"],
+                             num_face_up=self.config["num_face_up"], num_in_hand=self.config["num_in_hand"],
+                             seed=self.rng.integers(2 ** 63))
+        games = np.arange(num_envs)
+        absolute = env.reset()
+        finished = 0
+        for _ in range(steps):
+            movers = env.current_player - 1
+            ids = self.state_ids(absolute[games[:, None], PERSPECTIVES[movers]])
+            actions = np.argmax(self.q[ids], axis=1)
+            explore = self.rng.random(num_envs) < self.epsilon
+            actions[explore] = self.rng.integers(0, ACTION_SIZE, size=explore.sum())
+
+            absolute, rewards, dones = env.step(actions)
+            after = np.where(dones[:, None], env.terminal_states, absolute)
+            next_ids = self.state_ids(after[games[:, None], PERSPECTIVES[movers]])
+            targets = rewards + self.gamma * self.q[next_ids].max(axis=1) * ~dones
+
+            np.add.at(self.visits, (ids, actions), 1)
+            lr = 1.0 / self.visits[ids, actions] if self.lr is None else self.lr
+            self.q[ids, actions] += lr * (targets - self.q[ids, actions])
+            finished += int(dones.sum())
+            self.steps += 1
+        return finished
+
+    def save(self, path=None):
+        """Writes the tables and variant to `path` (default: the memory-map directory)"""
+        path = path or self.path
+        os.makedirs(path, exist_ok=True)
+        count = len(self)
+        if path != self.path:
+            for name in ("q", "visits", "keys"):
+                np.save(os.path.join(path, f"{name}.npy"), getattr(self, name)[:count])
+        else:
+            for array in (self.q, self.visits, self.keys):
+                array.flush()
+        temporary = os.path.join(path, "variant.json.tmp")
+        with open(temporary, "w") as file:
+            json.dump(dict(self.config, size=count, gamma=self.gamma), file)
+        os.replace(temporary, os.path.join(path, "variant.json"))
+
+    @classmethod
+    def load(cls, path):
+        """Memory-maps a saved table read-only"""
+        with open(os.path.join(path, "variant.json")) as file:
+            config = json.load(file)
+        size = config.pop("size")
+        gamma = config.pop("gamma")
+        learner = cls.__new__(cls)
+        learner.config = config
+        learner.index = StateIndex(config["ranks"], config["copies"])
+        learner.deck = variant_deck(config["ranks"], config["copies"])
+        learner.capacity = size
+        learner.gamma = gamma
+        learner.epsilon = 0.0
+        learner.lr = None
+        learner.path = path
+        learner.rng = np.random.default_rng()
+        learner.steps = 0
+        learner.q, learner.visits, learner.keys = (
+            np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')[:size] for name in ("q", "visits", "keys"))
+        learner.index.set_keys(learner.keys)
+        return learner
+
+
+def compare(learner, q_function, min_visits=10):
+    """How closely q_function (batch of observations -> Q-values) matches the table.
+
+    Only states whose every action was tried min_visits times are compared.
+    """
+    count = len(learner)
+    known = np.flatnonzero(learner.visits[:count].min(axis=1) >= min_visits)
+    states = learner.index.decode(learner.keys[known])
+    table_q = np.asarray(learner.q[known])
+    model_q = np.asarray(q_function(states))
+    return {
+        "states": int(len(known)),
+        "greedy_agreement": float((model_q.argmax(axis=1) == table_q.argmax(axis=1)).mean()) if len(known) else 0.0,
+        "q_rmse": float(np.sqrt(((model_q - table_q) ** 2).mean())) if len(known) else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tabular Q-learning on a reduced Palace variant")
+    parser.add_argument("--ranks", nargs="+", default=["2", "7", "10", "King"])
+    parser.add_argument("--copies", type=int, default=2, help="cards of each rank in the deck")
+    parser.add_argument("--deal", type=int, nargs=3, default=[1, 1, 1], metavar=("FACE_DOWN", "FACE_UP", "HAND"))
+    parser.add_argument("--steps", type=int, default=10_000, help="batched env steps")
+    parser.add_argument("--envs", type=int, default=256)
+    parser.add_argument("--capacity", type=int, default=1_000_000)
+    parser.add_argument("--output", default="tabular_q", help="directory for the memory-mapped tables")
+    parser.add_argument("--compare", help="DQN checkpoint (trained with --shared) to validate against the table")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    learner = TabularQLearner(args.ranks, args.copies, *args.deal, capacity=args.capacity, path=args.output,
+                              seed=args.seed)
+    start = time.perf_counter()
+    games = learner.train(args.steps, args.envs)
+    learner.save()
+    elapsed = time.perf_counter() - start
+    print(f"{args.steps * args.envs} transitions, {games} games, {len(learner)} states in {elapsed:.1f}s")
+
+    if args.compare:
+        import torch
+        from palace_dqn import DQNAgent
+
+        agent = DQNAgent(STATE_SIZE, ACTION_SIZE, memory_size=1)
+        agent.load_model(args.compare)
+        with torch.no_grad():
+            result = compare(learner, lambda states: agent.model(torch.from_numpy(states.astype(np.float32))).numpy())
+        print(json.dumps(result))
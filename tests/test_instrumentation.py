@@ -0,0 +1,34 @@
+import pstats
+
+import pytest
+
+from instrumentation import TrainingStats
+
+
+class CountingEnv:
+    """Stands in for CardGameEnv: every step is a valid play that ends nothing"""
+
+    def __init__(self):
+        self.pile = [0]
+        self.steps = 0
+
+    def get_state(self):
+        return None
+
+    def step(self, action):
+        self.steps += 1
+        return None, 1, False
+
+
+@pytest.mark.parametrize("first_step", [0, 3])
+def test_profile_window_covers_its_steps(tmp_path, first_step):
+    profile_path = tmp_path / "profile"
+    stats = TrainingStats(profile_window=(first_step, 4), profile_path=str(profile_path))
+    env = CountingEnv()
+    stats.instrument(env)
+    for _ in range(first_step + 4):
+        env.step(0)
+    assert stats.profile_window is None
+    profile = pstats.Stats(f"{profile_path}.prof")
+    calls = [count for (_, _, name), (count, *_) in profile.stats.items() if name == "step"]
+    assert calls == [4]
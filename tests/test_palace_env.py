@@ -0,0 +1,36 @@
+import numpy as np
+
+from palace_env import CardGameEnv
+
+MAX_MOVES = 1000
+
+
+def play_legal_game(env, seed):
+    """Plays random legal actions from a fresh deal until the episode ends; returns whether it did"""
+    env.reset(seed=seed)
+    rng = np.random.default_rng(seed)
+    for _ in range(MAX_MOVES):
+        _, _, done = env.step(int(rng.choice(np.flatnonzero(env.legal_action_mask()))))
+        if done:
+            return True
+    return False
+
+
+def test_legal_only_games_end():
+    env = CardGameEnv({}, [], [], legal_only=True, max_moves=MAX_MOVES)
+    truncated = 0
+    for seed in range(1000):
+        assert play_legal_game(env, seed), f"seed {seed} ran past max_moves"
+        assert env.game_over != env.truncated
+        truncated += env.truncated
+    # Some legal-only games cycle forever; those must be the ones that were cut off
+    assert 0 < truncated < 50
+
+
+def test_truncation_survives_snapshot_and_reset():
+    env = CardGameEnv({}, [], [], legal_only=True, max_moves=MAX_MOVES)
+    assert any(play_legal_game(env, seed) and env.truncated for seed in range(1000))
+    clone = env.clone()
+    assert (clone.moves, clone.truncated) == (MAX_MOVES, True)
+    env.reset()
+    assert (env.moves, env.truncated) == (0, False)
@@ -0,0 +1,257 @@
+import argparse
+import glob
+import hashlib
+import json
+import math
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from evaluate import play_games
+
+ELO_SCALE = 400 / math.log(10)
+
+
+def player_id(spec):
+    """Stable identity of a player spec: checkpoints are named by a hash of their contents.
+
+    Retraining into the same file gives a new id, and copying or renaming a
+    checkpoint keeps its results.
+    """
+    kind, _, path = spec.partition(":")
+    if not path or not os.path.isfile(path):
+        return spec
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return f"{kind}:{digest.hexdigest()[:16]}"
+
+
+class ResultCache:
+    """Finished pairings in a JSON file, keyed by both players' ids and the match settings"""
+
+    def __init__(self, path):
+        self.path = path
+        self.pairings = {}
+        if path and os.path.exists(path):
+            with open(path) as file:
+                self.pairings = json.load(file)["pairings"]
+
+    @staticmethod
+    def key(id_a, id_b, settings):
+        first, second = sorted((id_a, id_b))
+        return f"{first}|{second}|{settings}"
+
+    def get(self, id_a, id_b, settings):
+        """(wins of a, wins of b, draws) or None"""
+        entry = self.pairings.get(self.key(id_a, id_b, settings))
+        if entry is None:
+            return None
+        wins = entry["wins"] if entry["players"][0] == id_a else entry["wins"][::-1]
+        return wins[0], wins[1], entry["draws"]
+
+    def put(self, id_a, id_b, settings, wins_a, wins_b, draws):
+        self.pairings[self.key(id_a, id_b, settings)] = {"players": [id_a, id_b], "wins": [wins_a, wins_b],
+                                                        "draws": draws}
+
+    def save(self):
+        if self.path:
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w") as file:
+                json.dump({"pairings": self.pairings}, file, indent=1)
+            os.replace(temporary, self.path)
+
+
+def fit_ratings(ids, results, iterations=1000, tolerance=1e-9):
+    """Bradley-Terry maximum likelihood ratings on the Elo scale, averaging 1500.
+
+    results is a list of (id_a, id_b, wins_a, wins_b, draws); a draw counts as
+    half a win for each side. Refitting from every cached result is
+    order-independent and takes milliseconds, so ratings never drift with the
+    order matches were played in. Returns {id: (elo, standard error)}.
+    """
+    index = {player: i for i, player in enumerate(ids)}
+    count = len(ids)
+    score = [0.0] * count
+    games = [[0.0] * count for _ in range(count)]
+    for id_a, id_b, wins_a, wins_b, draws in results:
+        a, b = index[id_a], index[id_b]
+        score[a] += wins_a + draws / 2
+        score[b] += wins_b + draws / 2
+        games[a][b] += wins_a + wins_b + draws
+        games[b][a] += wins_a + wins_b + draws
+
+    # Hunter's MM updates, plus one virtual draw against an average player so
+    # winless or unbeaten players keep a finite rating
+    strength = [1.0] * count
+    for _ in range(iterations):
+        new_strength = []
+        for i in range(count):
+            denominator = sum(games[i][j] / (strength[i] + strength[j]) for j in range(count) if games[i][j])
+            new_strength.append((score[i] + 0.5) / (denominator + 1 / (strength[i] + 1))
+                                if denominator else strength[i])
+        mean_log = sum(math.log(s) for s in new_strength) / count
+        new_strength = [s / math.exp(mean_log) for s in new_strength]
+        change = max(abs(math.log(new / old)) for new, old in zip(new_strength, strength))
+        strength = new_strength
+        if change < tolerance:
+            break
+
+    ratings = {}
+    for i, player in enumerate(ids):
+        information = sum(games[i][j] * strength[i] * strength[j] / (strength[i] + strength[j]) ** 2
+                          for j in range(count) if games[i][j])
+        error = ELO_SCALE / math.sqrt(information) if information else float("inf")
+        ratings[player] = (1500 + ELO_SCALE * math.log(strength[i]), error)
+    return ratings
+
+
+def round_robin_pairs(ids):
+    return [(ids[i], ids[j]) for i in range(len(ids)) for j in range(i + 1, len(ids))]
+
+
+def swiss_pairs(ids, ratings, played):
+    """Pairs neighbours in the rating order, skipping pairings that were already played"""
+    waiting = sorted(ids, key=lambda player: -ratings.get(player, (1500, 0))[0])
+    pairs = []
+    while len(waiting) > 1:
+        first = waiting.pop(0)
+        for i, second in enumerate(waiting):
+            if frozenset((first, second)) not in played:
+                pairs.append((first, second))
+                waiting.pop(i)
+                break
+    return pairs
+
+
+def play_pairings(pairs, specs, games, seed, max_moves, workers, batch_games=100):
+    """Plays every pair half the games in each seat on the same deals; returns {pair: (wins_a, wins_b, draws)}"""
+    tasks = []
+    half = max(games // 2, 1)
+    for pair in pairs:
+        for swapped in (False, True):
+            for start in range(0, half, batch_games):
+                tasks.append((pair, swapped, seed + start, min(batch_games, half - start)))
+
+    results = {pair: [0, 0, 0] for pair in pairs}
+
+    def record(pair, swapped, outcome):
+        wins, draws, _ = outcome
+        if swapped:
+            wins = wins[::-1]
+        totals = results[pair]
+        totals[0] += wins[0]
+        totals[1] += wins[1]
+        totals[2] += draws
+
+    def seats(pair, swapped):
+        return (specs[pair[1]], specs[pair[0]]) if swapped else (specs[pair[0]], specs[pair[1]])
+
+    if workers <= 1:
+        for pair, swapped, first_seed, count in tasks:
+            record(pair, swapped, play_games(seats(pair, swapped), first_seed, count, max_moves))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+            futures = {pool.submit(play_games, seats(pair, swapped), first_seed, count, max_moves): (pair, swapped)
+                       for pair, swapped, first_seed, count in tasks}
+            for future in as_completed(futures):
+                record(*futures[future], future.result())
+    return {pair: tuple(totals) for pair, totals in results.items()}
+
+
+def run_league(specs, format="round-robin", rounds=None, games=200, seed=0, max_moves=1000, workers=None,
+               cache_path="league_results.json"):
+    """Plays the pairings the cache does not have yet and rates everyone on all cached results.
+
+    Returns (leaderboard rows sorted by rating, number of pairings played).
+    """
+    if workers is None:
+        workers = mp.cpu_count()
+    cache = ResultCache(cache_path)
+    # "seat-view" marks results played since DQN players read every seat through CardGameEnv.seat_view
+    settings = f"{games}:{seed}:{max_moves}:seat-view"
+    by_id = {}
+    for spec in specs:
+        by_id.setdefault(player_id(spec), spec)
+    ids = list(by_id)
+
+    def cached_results():
+        results = []
+        for id_a, id_b in round_robin_pairs(ids):
+            outcome = cache.get(id_a, id_b, settings)
+            if outcome is not None:
+                results.append((id_a, id_b, *outcome))
+        return results
+
+    played = 0
+
+    def play(pairs):
+        nonlocal played
+        new_pairs = [pair for pair in pairs if cache.get(*pair, settings) is None]
+        for (id_a, id_b), outcome in play_pairings(new_pairs, by_id, games, seed, max_moves, workers).items():
+            cache.put(id_a, id_b, settings, *outcome)
+        played += len(new_pairs)
+        cache.save()
+
+    if format == "round-robin":
+        play(round_robin_pairs(ids))
+    else:
+        for _ in range(rounds or max(1, math.ceil(math.log2(len(ids))) + 1)):
+            results = cached_results()
+            done = {frozenset((id_a, id_b)) for id_a, id_b, *_ in results}
+            pairs = swiss_pairs(ids, fit_ratings(ids, results), done)
+            if not pairs:
+                break
+            play(pairs)
+
+    results = cached_results()
+    ratings = fit_ratings(ids, results)
+    totals = {player: [0, 0.0] for player in ids}
+    for id_a, id_b, wins_a, wins_b, draws in results:
+        totals[id_a][0] += wins_a + wins_b + draws
+        totals[id_b][0] += wins_a + wins_b + draws
+        totals[id_a][1] += wins_a + draws / 2
+        totals[id_b][1] += wins_b + draws / 2
+    rows = [{"player": by_id[player], "id": player, "elo": ratings[player][0], "elo_error": ratings[player][1],
+             "games": totals[player][0], "score": totals[player][1] / totals[player][0] if totals[player][0] else 0.0}
+            for player in ids]
+    rows.sort(key=lambda row: -row["elo"])
+    return rows, played
+
+
+def format_leaderboard(rows):
+    lines = ["| Rank | Player | Elo | Games | Score |", "| --- | --- | --- | --- | --- |"]
+    for rank, row in enumerate(rows, start=1):
+        lines.append(f"| {rank} | {row['player']} | {row['elo']:.0f} ± {row['elo_error']:.0f} | "
+                     f"{row['games']} | {row['score']:.3f} |")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rate Palace checkpoints and baselines in a league")
+    parser.add_argument("players", nargs="*", default=["random", "computer"],
+                        help="player specs as in evaluate.py ('random', 'computer', 'dqn:<checkpoint>', ...)")
+    parser.add_argument("--checkpoints", default="agent*_model.pth",
+                        help="glob of DQN checkpoints to add to the league")
+    parser.add_argument("--format", choices=["round-robin", "swiss"], default="round-robin")
+    parser.add_argument("--rounds", type=int, help="Swiss rounds (default: log2(players) + 1)")
+    parser.add_argument("--games", type=int, default=200, help="games per pairing, half in each seat")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-moves", type=int, default=1000)
+    parser.add_argument("--cache", default="league_results.json", help="results of finished pairings")
+    parser.add_argument("--leaderboard", default="leaderboard.md")
+    args = parser.parse_args()
+
+    specs = list(args.players) + [f"dqn:{path}" for path in sorted(glob.glob(args.checkpoints))]
+    start = time.perf_counter()
+    rows, played = run_league(specs, args.format, args.rounds, args.games, args.seed, args.max_moves,
+                              args.workers, args.cache)
+    table = format_leaderboard(rows)
+    with open(args.leaderboard, "w") as file:
+        file.write(table + "\n")
+    print(table)
+    print(f"\n{played} new pairings played in {time.perf_counter() - start:.1f}s; leaderboard written to "
+          f"{args.leaderboard}")
@@ -0,0 +1,190 @@
+import argparse
+import multiprocessing as mp
+import queue
+import random
+import time
+
+import numpy as np
+import torch
+from torch.nn.utils import parameters_to_vector, vector_to_parameters
+
+from palace_dqn import DQNAgent
+from palace_env import CardGameEnv, STATE_SIZE
+
+ACTION_SIZE = 3
+
+
+def publish_weights(model, weights, version):
+    """Copies the model into shared memory. An odd version marks a write in progress."""
+    version.value += 1
+    weights[:] = parameters_to_vector(model.parameters()).detach().numpy()
+    version.value += 1
+
+
+def read_weights(model, weights, version):
+    """Loads the latest published weights into model and returns their version"""
+    while True:
+        before = version.value
+        if before % 2:
+            time.sleep(0)
+            continue
+        vector = torch.from_numpy(weights.copy())
+        if version.value == before:
+            vector_to_parameters(vector, model.parameters())
+            return before
+
+
+def run_actor(seed, shared_weights, version, epsilon, transitions, stop, chunk_size):
+    """Self-play worker: both seats use the latest broadcast policy on current-player-first views"""
+    torch.set_num_threads(1)
+    random.seed(seed)
+    np.random.seed(seed)
+    agent = DQNAgent(STATE_SIZE, ACTION_SIZE, memory_size=1)
+    weights = np.frombuffer(shared_weights, dtype=np.float32)
+    env = CardGameEnv({}, [], [], seed=seed, canonical=True)
+
+    states = np.zeros((chunk_size, STATE_SIZE), dtype=np.int8)
+    next_states = np.zeros((chunk_size, STATE_SIZE), dtype=np.int8)
+    actions = np.zeros(chunk_size, dtype=np.int8)
+    rewards = np.zeros(chunk_size, dtype=np.float32)
+    dones = np.zeros(chunk_size, dtype=np.bool_)
+    count = 0
+
+    local_version = -1
+    state = env.reset()
+    while not stop.is_set():
+        if version.value != local_version:
+            local_version = read_weights(agent.model, weights, version)
+            agent.clear_q_cache()
+        agent.epsilon = epsilon.value
+
+        mover = env.current_player
+        action = agent.act(state)
+        next_state, reward, done = env.step(action)
+        states[count] = state
+        actions[count] = action
+        rewards[count] = reward
+        # next_state is the next mover's view; the transition keeps the outcome as this mover sees it
+        next_states[count] = env.canonical_state(mover)
+        dones[count] = done
+        count += 1
+        state = env.reset() if done else next_state
+
+        if count == chunk_size:
+            chunk = (states.copy(), actions.copy(), rewards.copy(), next_states.copy(), dones.copy())
+            while not stop.is_set():
+                try:
+                    transitions.put(chunk, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            count = 0
+
+    # Unsent chunks are dropped rather than blocking shutdown
+    transitions.cancel_join_thread()
+
+
+def train(num_actors=None, total_steps=1_000_000, batch_size=32, replay_ratio=1.0,
+          broadcast_interval=20, chunk_size=256, memory_size=1_000_000, memory_path=None,
+          model_path="agent1_model.pth", load_path=None, seed=0, log_interval=10.0):
+    """Runs self-play actors in worker processes and trains one DQNAgent on their transitions.
+
+    The learner drains every chunk the actors have produced, then performs
+    replay_ratio * (new transitions / batch_size) minibatch updates and
+    republishes the weights every broadcast_interval updates.
+    """
+    if num_actors is None:
+        num_actors = max(mp.cpu_count() - 1, 1)
+    ctx = mp.get_context("spawn")
+    agent = DQNAgent(STATE_SIZE, ACTION_SIZE, memory_size=memory_size, memory_path=memory_path,
+                     canonical_observation=True)
+    if load_path:
+        agent.load_model(load_path)
+        # Both seats share the network, so it is trained on (and saved for) current-player-first views
+        agent.canonical_observation = True
+        agent.seat = None
+
+    param_count = sum(param.numel() for param in agent.model.parameters())
+    shared_weights = ctx.RawArray('f', param_count)
+    weights = np.frombuffer(shared_weights, dtype=np.float32)
+    version = ctx.RawValue('q', 0)
+    epsilon = ctx.RawValue('d', agent.epsilon)
+    publish_weights(agent.model, weights, version)
+
+    transitions = ctx.Queue(maxsize=4 * num_actors)
+    stop = ctx.Event()
+    actors = [ctx.Process(target=run_actor, daemon=True,
+                          args=(seed + i + 1, shared_weights, version, epsilon, transitions, stop, chunk_size))
+              for i in range(num_actors)]
+    for actor in actors:
+        actor.start()
+
+    steps = 0
+    updates = 0
+    pending_updates = 0.0
+    start = last_log = time.perf_counter()
+    try:
+        while steps < total_steps:
+            chunks = [transitions.get()]
+            while True:
+                try:
+                    chunks.append(transitions.get_nowait())
+                except queue.Empty:
+                    break
+
+            for chunk in chunks:
+                agent.memory.extend(*chunk)
+                steps += len(chunk[1])
+            pending_updates += replay_ratio * len(chunks) * chunk_size / batch_size
+
+            while pending_updates >= 1:
+                pending_updates -= 1
+                if agent.replay(batch_size) is None:
+                    continue
+                updates += 1
+                if updates % broadcast_interval == 0:
+                    publish_weights(agent.model, weights, version)
+            epsilon.value = agent.epsilon
+
+            now = time.perf_counter()
+            if now - last_log >= log_interval:
+                print(f"steps {steps} updates {updates} epsilon {agent.epsilon:.3f} "
+                      f"steps/sec {steps / (now - start):.0f}")
+                last_log = now
+    finally:
+        stop.set()
+        while True:
+            try:
+                transitions.get(timeout=0.1)
+            except queue.Empty:
+                break
+        for actor in actors:
+            actor.join(timeout=5)
+            if actor.is_alive():
+                actor.terminate()
+
+    agent.save_model(model_path)
+    return agent
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel actor/learner self-play training for Palace")
+    parser.add_argument("--actors", type=int, help="actor processes (default: one per spare core)")
+    parser.add_argument("--steps", type=int, default=1_000_000, help="environment steps to collect")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--replay-ratio", type=float, default=1.0,
+                        help="sampled transitions per collected transition")
+    parser.add_argument("--broadcast-interval", type=int, default=20,
+                        help="learner updates between weight broadcasts")
+    parser.add_argument("--chunk-size", type=int, default=256, help="transitions per actor message")
+    parser.add_argument("--memory-size", type=int, default=1_000_000)
+    parser.add_argument("--memory-path", help="directory for a memory-mapped replay buffer")
+    parser.add_argument("--model", default="agent1_model.pth", help="checkpoint to write")
+    parser.add_argument("--load", help="checkpoint to resume from")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    train(num_actors=args.actors, total_steps=args.steps, batch_size=args.batch_size,
+          replay_ratio=args.replay_ratio, broadcast_interval=args.broadcast_interval,
+          chunk_size=args.chunk_size, memory_size=args.memory_size, memory_path=args.memory_path,
+          model_path=args.model, load_path=args.load, seed=args.seed)
@@ -0,0 +1,155 @@
+import numpy as np
+
+from rules import DECK, RANK_ORDER, NUM_RANKS, VALID_PLAY as VALID_PLAY_TABLE
+from palace_env import NUM_ZONES, ZONE_IN_HAND, ZONE_FACE_UP, ZONE_FACE_DOWN, PILE_TOP_INDEX, STATE_SIZE
+
+# VALID_PLAY[seven_rule_active, pile_top, card_rank] with pile_top 0 meaning an empty pile
+VALID_PLAY = np.array(VALID_PLAY_TABLE, dtype=bool)
+
+
+class VecCardGameEnv:
+    """N independent CardGameEnv games stepped in lockstep as NumPy arrays.
+
+    Follows CardGameEnv's rules and 91-dim observation layout exactly. Each zone
+    keeps its card ranks in play order so `action % len(playable_cards)` selects
+    the same card the scalar env would. Finished games are reset automatically;
+    the observation they ended on is kept in `terminal_states`.
+    """
+
+    def __init__(self, num_envs, deck=DECK, num_face_down=3, num_face_up=3, num_in_hand=3, seed=None):
+        self.num_envs = num_envs
+        self.deck_ranks = np.array([RANK_ORDER[rank] for _, rank in deck], dtype=np.int8)
+        self.num_face_down = num_face_down
+        self.num_face_up = num_face_up
+        self.num_in_hand = num_in_hand
+        if 2 * (num_face_down + num_face_up + num_in_hand) > len(deck):
+            raise ValueError("Not enough cards to distribute")
+        self.rng = np.random.default_rng(seed)
+
+        capacity = len(deck)
+        self.cards = np.zeros((num_envs, 2, NUM_ZONES, capacity), dtype=np.int8)
+        self.lengths = np.zeros((num_envs, 2, NUM_ZONES), dtype=np.int16)
+        self.pile = np.zeros((num_envs, capacity), dtype=np.int8)
+        self.pile_len = np.zeros(num_envs, dtype=np.int16)
+        self.pile_counts = np.zeros((num_envs, NUM_RANKS), dtype=np.int8)
+        self.seven_rule_active = np.zeros(num_envs, dtype=bool)
+        self.current_player = np.ones(num_envs, dtype=np.int8)
+        self.state = np.zeros((num_envs, STATE_SIZE), dtype=np.int8)
+        self.terminal_states = np.zeros((num_envs, STATE_SIZE), dtype=np.int8)
+
+        self._envs = np.arange(num_envs)
+        self._slots = np.arange(capacity)
+        self._ranks = np.arange(NUM_RANKS)
+        self._zone_offsets = np.arange(2 * NUM_ZONES).reshape(2, NUM_ZONES) * NUM_RANKS - 1
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self._reset_games(self._envs)
+        return self.state.copy()
+
+    def _reset_games(self, games):
+        count = len(games)
+        order = np.argsort(self.rng.random((count, len(self.deck_ranks))), axis=1)
+        dealt = self.deck_ranks[order]
+        per_player = self.num_face_down + self.num_face_up + self.num_in_hand
+        face_up_end = self.num_face_down + self.num_face_up
+
+        self.cards[games] = 0
+        self.state[games] = 0
+        for player in range(2):
+            player_cards = dealt[:, player * per_player:(player + 1) * per_player]
+            zones = ((ZONE_FACE_DOWN, player_cards[:, :self.num_face_down]),
+                     (ZONE_FACE_UP, player_cards[:, self.num_face_down:face_up_end]),
+                     (ZONE_IN_HAND, player_cards[:, face_up_end:]))
+            for zone, ranks in zones:
+                size = ranks.shape[1]
+                self.cards[games, player, zone, :size] = ranks
+                self.lengths[games, player, zone] = size
+                rows = np.repeat(games, size)
+                np.add.at(self.state, (rows, self._zone_offsets[player, zone] + ranks.ravel()), 1)
+
+        self.pile_len[games] = 0
+        self.pile_counts[games] = 0
+        self.seven_rule_active[games] = False
+        self.current_player[games] = self.rng.integers(1, 3, size=count)
+
+    def playable_counts(self):
+        """Number of cards the current player of each game can choose between"""
+        lengths = self.lengths[self._envs, self.current_player - 1]
+        return np.where(lengths[:, ZONE_IN_HAND] > 0, lengths[:, ZONE_IN_HAND],
+                        np.where(lengths[:, ZONE_FACE_UP] > 0, lengths[:, ZONE_FACE_UP],
+                                 lengths[:, ZONE_FACE_DOWN]))
+
+    def step(self, actions):
+        games = self._envs
+        players = self.current_player - 1
+        lengths = self.lengths[games, players]
+        zones = np.where(lengths[:, ZONE_IN_HAND] > 0, ZONE_IN_HAND,
+                         np.where(lengths[:, ZONE_FACE_UP] > 0, ZONE_FACE_UP, ZONE_FACE_DOWN))
+        counts = lengths[games, zones]
+        empty = counts == 0
+
+        # Ensure actions are within bounds of playable cards
+        slots = np.asarray(actions) % np.maximum(counts, 1)
+        ranks = self.cards[games, players, zones, slots]
+        valid = ~empty & VALID_PLAY[self.seven_rule_active.view(np.int8),
+                                    self.state[:, PILE_TOP_INDEX], ranks]
+
+        rewards = np.where(empty, -10, np.where(valid, 1, -5)).astype(np.float32)
+        dones = np.zeros(self.num_envs, dtype=bool)
+
+        pick_up = np.flatnonzero(~valid)
+        if pick_up.size:
+            self._pick_up_pile(pick_up, players[pick_up])
+            self.current_player[pick_up] = 3 - self.current_player[pick_up]
+
+        play = np.flatnonzero(valid)
+        if play.size:
+            won = self._play_cards(play, players[play], zones[play], slots[play], ranks[play])
+            rewards[play[won]] = 10
+            dones[play[won]] = True
+
+        finished = np.flatnonzero(dones)
+        if finished.size:
+            self.terminal_states[finished] = self.state[finished]
+            self._reset_games(finished)
+
+        return self.state.copy(), rewards, dones
+
+    def _play_cards(self, games, players, zones, slots, ranks):
+        rows = self.cards[games, players, zones]
+        shifted = np.where(self._slots >= slots[:, None], np.roll(rows, -1, axis=1), rows)
+        self.cards[games, players, zones] = shifted
+        self.lengths[games, players, zones] -= 1
+        self.state[games, self._zone_offsets[players, zones] + ranks] -= 1
+
+        self.pile[games, self.pile_len[games]] = ranks
+        self.pile_len[games] += 1
+        self.pile_counts[games, ranks - 1] += 1
+        self.state[games, PILE_TOP_INDEX] = ranks
+
+        burned = games[ranks == 10]
+        self.pile_len[burned] = 0
+        self.pile_counts[burned] = 0
+        self.state[burned, PILE_TOP_INDEX] = 0
+
+        self.seven_rule_active[games] = ranks == 7
+        play_again = (ranks == 2) | (ranks == 10)
+        switch = games[~play_again]
+        self.current_player[switch] = 3 - self.current_player[switch]
+
+        return self.lengths[games, players].sum(axis=1) == 0
+
+    def _pick_up_pile(self, games, players):
+        pile_len = self.pile_len[games]
+        hand_len = self.lengths[games, players, ZONE_IN_HAND]
+        rows, slots = np.nonzero(self._slots < pile_len[:, None])
+        self.cards[games[rows], players[rows], ZONE_IN_HAND, hand_len[rows] + slots] = self.pile[games[rows], slots]
+        self.lengths[games, players, ZONE_IN_HAND] += pile_len
+
+        columns = self._zone_offsets[players, ZONE_IN_HAND][:, None] + 1 + self._ranks
+        self.state[games[:, None], columns] += self.pile_counts[games]
+        self.state[games, PILE_TOP_INDEX] = 0
+        self.pile_len[games] = 0
+        self.pile_counts[games] = 0